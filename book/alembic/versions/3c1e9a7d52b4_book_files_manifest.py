@@ -0,0 +1,37 @@
+"""Book files manifest
+
+Revision ID: 3c1e9a7d52b4
+Revises: af2d3be755fc
+Create Date: 2026-10-18 10:12:31.418207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1e9a7d52b4'
+down_revision: Union[str, None] = 'af2d3be755fc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('book_files',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('file_name', sa.String(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.BIGINT(), nullable=False),
+    sa.Column('mtime', sa.Float(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_book_files_file_name'), 'book_files', ['file_name'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_book_files_file_name'), table_name='book_files')
+    op.drop_table('book_files')
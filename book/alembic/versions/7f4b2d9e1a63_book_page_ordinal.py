@@ -0,0 +1,42 @@
+"""Book page ordinal and page count
+
+Revision ID: 7f4b2d9e1a63
+Revises: 3c1e9a7d52b4
+Create Date: 2026-10-18 11:02:47.593120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f4b2d9e1a63'
+down_revision: Union[str, None] = '3c1e9a7d52b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('book_page', sa.Column('page_no', sa.Integer(), nullable=True))
+    op.execute(
+        "UPDATE book_page AS b_p SET page_no = numbered.page_no "
+        "FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY book_id ORDER BY id) - 1 AS page_no "
+        "FROM book_page) AS numbered "
+        "WHERE b_p.id = numbered.id"
+    )
+    op.alter_column('book_page', 'page_no', nullable=False)
+    op.create_index('ix_book_page_book_id_page_no', 'book_page', ['book_id', 'page_no'], unique=True)
+
+    op.add_column('books', sa.Column('page_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        "UPDATE books AS b SET page_count = "
+        "(SELECT COUNT(*) FROM book_page AS b_p WHERE b_p.book_id = b.id)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('books', 'page_count')
+    op.drop_index('ix_book_page_book_id_page_no', table_name='book_page')
+    op.drop_column('book_page', 'page_no')
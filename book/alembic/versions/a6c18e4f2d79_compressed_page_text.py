@@ -0,0 +1,30 @@
+"""Compressed page text
+
+Revision ID: a6c18e4f2d79
+Revises: f27d8a4c90b5
+Create Date: 2026-10-18 16:02:41.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c18e4f2d79'
+down_revision: Union[str, None] = 'f27d8a4c90b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('books', sa.Column('page_codec', sa.String(length=10), nullable=True))
+    op.add_column('books', sa.Column('page_dictionary', sa.LargeBinary(), nullable=True))
+    op.add_column('book_page', sa.Column('text_z', sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('book_page', 'text_z')
+    op.drop_column('books', 'page_dictionary')
+    op.drop_column('books', 'page_codec')
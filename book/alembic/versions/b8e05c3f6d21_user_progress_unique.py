@@ -0,0 +1,30 @@
+"""Unique reading progress per user and book
+
+Revision ID: b8e05c3f6d21
+Revises: 7f4b2d9e1a63
+Create Date: 2026-10-18 11:48:09.264515
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e05c3f6d21'
+down_revision: Union[str, None] = '7f4b2d9e1a63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "DELETE FROM user_progress AS u_p "
+        "USING user_progress AS newer "
+        "WHERE newer.user_id = u_p.user_id AND newer.book_id = u_p.book_id AND newer.id > u_p.id"
+    )
+    op.create_index('ix_user_progress_user_id_book_id', 'user_progress', ['user_id', 'book_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_progress_user_id_book_id', table_name='user_progress')
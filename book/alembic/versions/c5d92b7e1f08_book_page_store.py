@@ -0,0 +1,26 @@
+"""Book page store checksum
+
+Revision ID: c5d92b7e1f08
+Revises: a6c18e4f2d79
+Create Date: 2026-10-18 16:48:12.904316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d92b7e1f08'
+down_revision: Union[str, None] = 'a6c18e4f2d79'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('books', sa.Column('page_store_checksum', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('books', 'page_store_checksum')
@@ -0,0 +1,37 @@
+"""Book table of contents
+
+Revision ID: d41a6f0c8e37
+Revises: b8e05c3f6d21
+Create Date: 2026-10-18 13:05:52.871346
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41a6f0c8e37'
+down_revision: Union[str, None] = 'b8e05c3f6d21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('book_toc',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('ordinal', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('level', sa.Integer(), nullable=False),
+    sa.Column('page_no', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_book_toc_book_id_ordinal', 'book_toc', ['book_id', 'ordinal'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_book_toc_book_id_ordinal', table_name='book_toc')
+    op.drop_table('book_toc')
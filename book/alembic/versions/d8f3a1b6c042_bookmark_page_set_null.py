@@ -0,0 +1,34 @@
+"""Keep bookmarks when book pages are replaced
+
+Revision ID: d8f3a1b6c042
+Revises: c5d92b7e1f08
+Create Date: 2026-10-18 18:30:12.402771
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f3a1b6c042'
+down_revision: Union[str, None] = 'c5d92b7e1f08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_constraint('bookmarks_book_page_fkey', 'bookmarks', type_='foreignkey')
+    op.alter_column('bookmarks', 'book_page', nullable=True)
+    op.create_foreign_key(
+        'bookmarks_book_page_fkey', 'bookmarks', 'book_page', ['book_page'], ['id'], ondelete='SET NULL'
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('bookmarks_book_page_fkey', 'bookmarks', type_='foreignkey')
+    op.execute("DELETE FROM bookmarks WHERE book_page IS NULL")
+    op.alter_column('bookmarks', 'book_page', nullable=False)
+    op.create_foreign_key(
+        'bookmarks_book_page_fkey', 'bookmarks', 'book_page', ['book_page'], ['id'], ondelete='CASCADE'
+    )
@@ -0,0 +1,36 @@
+"""Full-text search vector for book pages
+
+Revision ID: e9c37b15a8f2
+Revises: d41a6f0c8e37
+Create Date: 2026-10-18 14:21:36.102958
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from config_data.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9c37b15a8f2'
+down_revision: Union[str, None] = 'd41a6f0c8e37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('book_page', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.execute(
+        sa.text("UPDATE book_page SET search_vector = to_tsvector(CAST(:language AS regconfig), coalesce(text, ''))")
+        .bindparams(language=settings.SEARCH_LANGUAGE)
+    )
+    op.create_index('ix_book_page_search_vector', 'book_page', ['search_vector'], unique=False,
+                    postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_book_page_search_vector', table_name='book_page', postgresql_using='gin')
+    op.drop_column('book_page', 'search_vector')
@@ -0,0 +1,37 @@
+"""Bookmark page ordinal, snippet and user index
+
+Revision ID: f27d8a4c90b5
+Revises: e9c37b15a8f2
+Create Date: 2026-10-18 15:10:04.337820
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f27d8a4c90b5'
+down_revision: Union[str, None] = 'e9c37b15a8f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('bookmarks', sa.Column('page_no', sa.Integer(), nullable=True))
+    op.add_column('bookmarks', sa.Column('snippet', sa.String(length=100), nullable=True))
+    op.execute(
+        "UPDATE bookmarks AS b_m SET page_no = b_p.page_no, snippet = LEFT(COALESCE(b_p.text, ''), 100) "
+        "FROM book_page AS b_p "
+        "WHERE b_p.id = b_m.book_page"
+    )
+    op.alter_column('bookmarks', 'page_no', nullable=False)
+    op.alter_column('bookmarks', 'snippet', nullable=False)
+    op.create_index('ix_bookmarks_user_id_bookmark_id', 'bookmarks', ['user_id', 'bookmark_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_bookmarks_user_id_bookmark_id', table_name='bookmarks')
+    op.drop_column('bookmarks', 'snippet')
+    op.drop_column('bookmarks', 'page_no')
@@ -0,0 +1,61 @@
+"""
+Степень сжатия страниц книги и время их распаковки для zlib и zstd.
+Запуск из каталога book: python -m benchmarks.compression [путь к книге]
+"""
+import asyncio
+import sys
+import time
+
+from database.compression import make_codec, train_dictionary, zstandard
+from services.extractors import iter_pdf_text, iter_txt_text, shutdown_process_pool
+from services.paginator import PageSplitter
+
+
+DEFAULT_BOOK = 'books/sql_primer.pdf'
+LEVEL = 6
+REPEATS = 20
+
+
+async def read_pages(path: str) -> list[str]:
+    chunks = iter_pdf_text(path) if path.endswith('.pdf') else iter_txt_text(path)
+    splitter = PageSplitter()
+    pages = []
+    async for chunk in chunks:
+        pages.extend(splitter.feed(chunk))
+    pages.extend(splitter.close())
+    return pages
+
+
+def measure(codec, pages: list[str]) -> tuple[float, float]:
+    compressed = [codec.compress(page_text) for page_text in pages]
+    ratio = sum(len(page_text.encode('utf-8')) for page_text in pages) / sum(map(len, compressed))
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        for data in compressed:
+            codec.decompress(data)
+    return ratio, (time.perf_counter() - start) / REPEATS / len(compressed)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_BOOK
+    try:
+        pages = asyncio.run(read_pages(path))
+    finally:
+        shutdown_process_pool()
+
+    codecs = [('zlib', make_codec('zlib', LEVEL))]
+    if zstandard is not None:
+        codecs.append(('zstd', make_codec('zstd', LEVEL)))
+        # Словарь обучается на первой порции страниц, как при загрузке книги
+        dictionary = train_dictionary('zstd', pages[:500])
+        if dictionary is not None:
+            codecs.append(('zstd + dictionary', make_codec('zstd', LEVEL, dictionary)))
+
+    print(f'{path}: {len(pages)} pages')
+    for name, codec in codecs:
+        ratio, decode_time = measure(codec, pages)
+        print(f'{name}: ratio {ratio:.1f}x, decode {decode_time * 1e6:.0f} us per page')
+
+
+if __name__ == '__main__':
+    main()
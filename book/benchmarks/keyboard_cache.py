@@ -0,0 +1,53 @@
+"""
+Стоимость построения клавиатуры страницы без кэша и с кэшем: время
+и выделенная память на один вызов.
+Запуск из каталога book: python -m benchmarks.keyboard_cache
+"""
+import time
+import tracemalloc
+
+from keyboards.keyboard_cache import keyboard_cache
+from keyboards.pagination_kb import create_pagination_keyboard
+
+
+CALLS = 2000
+TOTAL_PAGES = 1000
+
+
+def build_uncached(page: int):
+    # Исходная функция без декоратора
+    return create_pagination_keyboard.__wrapped__(1, page, TOTAL_PAGES)
+
+
+def build_cached(page: int):
+    return create_pagination_keyboard(1, page, TOTAL_PAGES)
+
+
+def measure(build) -> tuple[float, float]:
+    start = time.perf_counter()
+    for call in range(CALLS):
+        build(call % TOTAL_PAGES)
+    elapsed = (time.perf_counter() - start) / CALLS
+
+    tracemalloc.start()
+    snapshot = tracemalloc.take_snapshot()
+    markups = [build(call % TOTAL_PAGES) for call in range(CALLS)]
+    allocated = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(snapshot, 'filename'))
+    tracemalloc.stop()
+    del markups
+    return elapsed, allocated / CALLS
+
+
+def main():
+    uncached_time, uncached_memory = measure(build_uncached)
+    # Кэш заполняется первым проходом, дальше все вызовы - попадания
+    for page in range(TOTAL_PAGES):
+        build_cached(page)
+    cached_time, cached_memory = measure(build_cached)
+    print(f'build: {uncached_time * 1e6:.1f} us, {uncached_memory / 1024:.1f} KiB per call')
+    print(f'cache hit: {cached_time * 1e6:.1f} us, {cached_memory / 1024:.2f} KiB per call')
+    print(f'hits: {keyboard_cache.hits}, misses: {keyboard_cache.misses}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Запись страниц книги в book_page: прежний executemany INSERT
+и COPY во временную таблицу с переносом порциями.
+Нужна БД из настроек бота, все изменения откатываются.
+Запуск из каталога book: python -m benchmarks.page_copy
+"""
+import asyncio
+import time
+
+from sqlalchemy import bindparam, insert
+
+from database.database import async_session, engine
+from database.models import Book, BookPage
+from services.paginator import PageSplitter
+from services.search import to_search_vector
+from services.write_book_in_db import BookWriter
+
+
+PAGES = 5000
+
+
+def make_pages() -> list[str]:
+    paragraph = (
+        'Реляционная модель данных описывает таблицы, строки и связи между ними. '
+        'Запрос выбирает строки, а индекс ускоряет поиск по ключу.\n'
+    )
+    splitter = PageSplitter()
+    pages = list(splitter.feed(paragraph * (PAGES * 40)))
+    return pages[:PAGES]
+
+
+async def insert_executemany(session, book_id, pages):
+    query = insert(BookPage).values(
+        book_id=bindparam('page_book_id'),
+        page_no=bindparam('page_page_no'),
+        text=bindparam('page_text'),
+        search_vector=to_search_vector(bindparam('page_text')),
+    )
+    for start in range(0, len(pages), BookWriter.page_batch_size):
+        await session.execute(query, [
+            {'page_text': page_text, 'page_book_id': book_id, 'page_page_no': page_no}
+            for page_no, page_text in enumerate(pages[start:start + BookWriter.page_batch_size], start=start)
+        ])
+
+
+async def insert_copy(session, book_id, pages):
+    await BookWriter._create_staging_table(session)
+    for start in range(0, len(pages), BookWriter.page_batch_size):
+        await BookWriter._insert_pages(session, pages[start:start + BookWriter.page_batch_size], start)
+        await BookWriter._move_staged_pages(session, book_id)
+
+
+async def measure(write, pages) -> float:
+    async with async_session() as session:
+        transaction = await session.begin()
+        book = Book(name='benchmark-page-copy')
+        session.add(book)
+        await session.flush()
+        start = time.perf_counter()
+        await write(session, book.id, pages)
+        elapsed = time.perf_counter() - start
+        await transaction.rollback()
+    return elapsed
+
+
+async def main():
+    pages = make_pages()
+    for name, write in (('executemany INSERT', insert_executemany), ('COPY + INSERT ... SELECT', insert_copy)):
+        elapsed = await measure(write, pages)
+        print(f'{name}: {len(pages)} pages in {elapsed:.2f} s, {len(pages) / elapsed:.0f} rows/s')
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
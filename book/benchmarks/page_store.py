@@ -0,0 +1,78 @@
+"""
+Время чтения страницы книги: из БД (промах кэша), из кэша страниц
+и из файлов книги через mmap. Книга берется из БД из настроек бота,
+файлы для нее пишутся во временный каталог.
+Запуск из каталога book: python -m benchmarks.page_store [book_id]
+"""
+import asyncio
+import sys
+import tempfile
+import time
+
+from sqlalchemy import select
+
+from database.cache import page_cache
+from database.database import async_session, engine
+from database.models import Book, BookPage
+from database.page_store import PageStore, PageStoreWriter
+from database.pages import get_page
+
+
+REPEATS = 5
+
+
+async def load_pages(book_id: int | None) -> tuple[int, list[str]]:
+    async with async_session() as session:
+        if book_id is None:
+            result = await session.execute(
+                select(BookPage.book_id).where(BookPage.text.is_not(None)).limit(1)
+            )
+            book_id = result.scalar_one()
+        result = await session.execute(
+            select(BookPage.text).where(BookPage.book_id == book_id).order_by(BookPage.page_no)
+        )
+        pages = list(result.scalars())
+        book = await session.get(Book, book_id)
+        if book.page_codec is not None or book.page_store_checksum is not None:
+            raise SystemExit(f'Book {book_id} is not stored as plain text in book_page')
+    return book_id, pages
+
+
+async def measure(read, page_count: int) -> float:
+    best = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for page_no in range(page_count):
+            await read(page_no)
+        best = min(best, (time.perf_counter() - start) / page_count)
+    return best
+
+
+async def main():
+    book_id, pages = await load_pages(int(sys.argv[1]) if len(sys.argv) > 1 else None)
+
+    async def read_db(page_no):
+        page_cache.invalidate_book(book_id)
+        return await get_page(book_id, page_no)
+
+    async def read_cache(page_no):
+        return await get_page(book_id, page_no)
+
+    with tempfile.TemporaryDirectory() as directory:
+        writer = PageStoreWriter(directory, book_id)
+        writer.append(pages)
+        store = PageStore(directory)
+        store._books[book_id] = store._open(book_id, writer.finish())
+
+        async def read_mmap(page_no):
+            return store.get(book_id, page_no)
+
+        print(f'book {book_id}: {len(pages)} pages')
+        for name, read in (('DB', read_db), ('page cache', read_cache), ('mmap', read_mmap)):
+            print(f'{name}: {await measure(read, len(pages)) * 1e6:.0f} us per page')
+        store.invalidate_book(book_id)
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
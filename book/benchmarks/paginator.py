@@ -0,0 +1,43 @@
+"""
+Скорость разбиения текста на страницы.
+Запуск из каталога book: python -m benchmarks.paginator
+"""
+import time
+
+from services.paginator import PageSplitter
+
+
+CHUNK_SIZE = 64 * 1024
+REPEATS = 5
+
+
+def make_text(paragraphs: int = 43_000) -> str:
+    paragraph = (
+        'Реляционная модель данных описывает таблицы, строки и связи между ними. '
+        'Запрос выбирает строки; индекс ускоряет поиск по ключу, а транзакция - нет!\n'
+    )
+    return paragraph * paragraphs
+
+
+def paginate(text: str) -> int:
+    splitter = PageSplitter()
+    pages = 0
+    for start in range(0, len(text), CHUNK_SIZE):
+        pages += sum(1 for _ in splitter.feed(text[start:start + CHUNK_SIZE]))
+    return pages + sum(1 for _ in splitter.close())
+
+
+def main():
+    text = make_text()
+    best = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        pages = paginate(text)
+        best = min(best, time.perf_counter() - start)
+    # Кириллица занимает в UTF-8 два байта, поэтому скорость считается по байтам, а не по символам
+    size = len(text.encode())
+    print(f'{size / 1e6:.1f} MB, {pages} pages: {best * 1000:.1f} ms, {size / best / 1e6:.0f} MB/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,12 +3,58 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     TOKEN: str
-    ADMIN_IDS: int
+    # id администраторов через запятую
+    ADMIN_IDS: str
     POSTGRES_HOST: str
     POSTGRES_PORT: int
     POSTGRES_DB: str
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
+    INGEST_WORKERS: int | None = None
+    PAGE_CACHE_BYTES: int = 64 * 1024 * 1024
+    PREFETCH_PAGES: int = 3
+    PREFETCH_CONCURRENCY: int = 4
+    PROGRESS_FLUSH_INTERVAL: float = 5.0
+    PROGRESS_BUFFER_SIZE: int = 100_000
+    READER_EDIT_IN_PLACE: bool = True
+    KEYBOARD_CACHE_SIZE: int = 10_000
+    SEARCH_LANGUAGE: str = 'russian'
+    SEARCH_RESULTS_PER_PAGE: int = 5
+    WEBHOOK_URL: str | None = None
+    WEBHOOK_PATH: str = '/webhook'
+    WEBHOOK_SECRET: str | None = None
+    WEBHOOK_HOST: str = '0.0.0.0'
+    WEBHOOK_PORT: int = 8000
+    WEBHOOK_MAX_CONNECTIONS: int = 40
+    UPDATE_CONCURRENCY: int = 100
+    TELEGRAM_GLOBAL_RATE: float = 30.0
+    TELEGRAM_CHAT_RATE: float = 1.0
+    TELEGRAM_CHAT_BURST: int = 3
+    TELEGRAM_MAX_RETRIES: int = 3
+    METRICS_HOST: str = '0.0.0.0'
+    METRICS_PORT: int | None = 9100
+    SLOW_UPDATE_THRESHOLD: float = 1.0
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 5.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 500
+    DB_STATEMENT_TIMEOUT_MS: int = 30_000
+    PAGE_COMPRESSION: str = 'none'
+    PAGE_COMPRESSION_LEVEL: int = 6
+    PAGE_COMPRESSION_DICTIONARY: bool = True
+    PAGE_CACHE_COMPRESSED: bool = False
+    PAGE_BACKEND: str = 'db'
+    PAGE_STORE_DIR: str = 'page_store'
+    INGEST_CONCURRENCY: int = 2
+    WATCH_BOOKS_FOLDER: bool = False
+    WATCH_INTERVAL: float = 30.0
+    CALLBACK_DEBOUNCE_WINDOW: float = 1.0
+
+    @property
+    def admin_ids(self) -> set[int]:
+        return {int(admin_id) for admin_id in self.ADMIN_IDS.split(',') if admin_id.strip()}
 
     class Config:
         env_file = ".env"
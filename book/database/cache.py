@@ -1,23 +1,97 @@
-PAGE_SIZE = 1050
-BOOK_STORAGE = {}
-
-
-async def _get_part_text(text: str, start: int, size: int) -> tuple[str, int]:
-    end_signs = ',.!:;?'
-    counter = 0
-    if len(text) < start + size:
-        size = len(text) - start
-        text = text[start:start + size]
-    else:
-        if text[start + size] == '.' and text[start + size - 1] in end_signs:
-            text = text[start:start + size - 2]
-            size -= 2
-        else:
-            text = text[start:start + size]
-        for i in range(size - 1, 0, -1):
-            if text[i] in end_signs:
-                break
-            counter = size - i
-    page_text = text[:size - counter]
-    page_size = size - counter
-    return page_text, page_size
+import sys
+from collections import OrderedDict
+
+from config_data.config import settings
+from services.metrics import Gauge
+
+
+class PageCache:
+    """
+    LRU-кэш текстов страниц с ключом (book_id, page_no).
+    Страницы сжатых книг могут храниться в нем сжатыми (bytes).
+    Размер ограничен бюджетом в байтах: при его превышении
+    вытесняются давно не читавшиеся страницы
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pages: OrderedDict[tuple[int, int], str | bytes] = OrderedDict()
+
+    def get(self, book_id: int, page_no: int) -> str | bytes | None:
+        key = (book_id, page_no)
+        page_text = self._pages.get(key)
+        if page_text is None:
+            self.misses += 1
+            return None
+        self._pages.move_to_end(key)
+        self.hits += 1
+        return page_text
+
+    def put(self, book_id: int, page_no: int, page_text: str | bytes):
+        size = sys.getsizeof(page_text)
+        if size > self.max_bytes:
+            return
+        key = (book_id, page_no)
+        old_text = self._pages.pop(key, None)
+        if old_text is not None:
+            self.size_bytes -= sys.getsizeof(old_text)
+        self._pages[key] = page_text
+        self.size_bytes += size
+        while self.size_bytes > self.max_bytes:
+            _, evicted_text = self._pages.popitem(last=False)
+            self.size_bytes -= sys.getsizeof(evicted_text)
+            self.evictions += 1
+
+    def __contains__(self, key: tuple[int, int]) -> bool:
+        return key in self._pages
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def invalidate_book(self, book_id: int):
+        for key in [key for key in self._pages if key[0] == book_id]:
+            self.size_bytes -= sys.getsizeof(self._pages.pop(key))
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'pages': len(self._pages),
+            'size_bytes': self.size_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class BookVersions:
+    """
+    Номера версий книг. Перезагрузка книги увеличивает номер, а кэши,
+    которые заполняются после запроса к БД, сверяют номер до и после
+    запроса и не запоминают данные, прочитанные до перезагрузки
+    """
+
+    def __init__(self):
+        self._versions: dict[int, int] = {}
+
+    def get(self, book_id: int) -> int:
+        return self._versions.get(book_id, 0)
+
+    def bump(self, book_id: int):
+        self._versions[book_id] = self.get(book_id) + 1
+
+
+page_cache = PageCache(settings.PAGE_CACHE_BYTES)
+book_versions = BookVersions()
+
+page_cache_pages = Gauge('page_cache_pages', 'Pages held in the page cache', function=lambda: len(page_cache))
+page_cache_size = Gauge(
+    'page_cache_size_bytes', 'Memory used by cached pages', function=lambda: page_cache.size_bytes
+)
+page_cache_hits = Gauge('page_cache_hits', 'Page cache hits since start', function=lambda: page_cache.hits)
+page_cache_misses = Gauge('page_cache_misses', 'Page cache misses since start', function=lambda: page_cache.misses)
+page_cache_evictions = Gauge(
+    'page_cache_evictions', 'Pages evicted from the page cache since start', function=lambda: page_cache.evictions
+)
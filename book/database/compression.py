@@ -0,0 +1,75 @@
+import logging
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstd необязателен, без него доступен только zlib
+    zstandard = None
+
+
+logger = logging.getLogger(__name__)
+
+DICTIONARY_SIZE = 64 * 1024
+
+
+class ZlibCodec:
+    name = 'zlib'
+
+    def __init__(self, level: int = 6, dictionary: bytes | None = None):
+        self.level = level
+
+    def compress(self, page_text: str) -> bytes:
+        return zlib.compress(page_text.encode('utf-8'), self.level)
+
+    def decompress(self, data: bytes) -> str:
+        return zlib.decompress(data).decode('utf-8')
+
+
+class ZstdCodec:
+    """Сжатие zstd, при наличии словаря - со словарем, обученным на страницах книги"""
+    name = 'zstd'
+
+    def __init__(self, level: int = 6, dictionary: bytes | None = None):
+        dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        self._compressor = zstandard.ZstdCompressor(level=level, dict_data=dict_data)
+        self._decompressor = zstandard.ZstdDecompressor(dict_data=dict_data)
+
+    def compress(self, page_text: str) -> bytes:
+        return self._compressor.compress(page_text.encode('utf-8'))
+
+    def decompress(self, data: bytes) -> str:
+        return self._decompressor.decompress(data).decode('utf-8')
+
+
+CODECS = {codec.name: codec for codec in (ZlibCodec, ZstdCodec)}
+
+
+def ingest_codec_name(name: str) -> str | None:
+    """Формат сжатия для новых книг по настройке PAGE_COMPRESSION"""
+    if name == 'none':
+        return None
+    if name not in CODECS:
+        raise ValueError(f'Unknown page compression: {name}')
+    if name == 'zstd' and zstandard is None:
+        logger.warning('zstandard is not installed, pages are compressed with zlib')
+        return 'zlib'
+    return name
+
+
+def make_codec(name: str, level: int = 6, dictionary: bytes | None = None) -> ZlibCodec | ZstdCodec:
+    if name == 'zstd' and zstandard is None:
+        raise RuntimeError('Book pages are compressed with zstd, but zstandard is not installed')
+    return CODECS[name](level, dictionary)
+
+
+def train_dictionary(name: str, samples: list[str]) -> bytes | None:
+    """Словарь для сжатия страниц одной книги или None, если его не обучить"""
+    if name != 'zstd':
+        return None
+    try:
+        return zstandard.train_dictionary(
+            DICTIONARY_SIZE, [sample.encode('utf-8') for sample in samples]
+        ).as_bytes()
+    except zstandard.ZstdError:
+        # Слишком мало текста для обучения - сжимаем без словаря
+        return None
@@ -1,5 +1,11 @@
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
 from config_data.config import settings
+from services.metrics import Counter, Gauge, Histogram
 
 
 DATABASE_URL = (f"postgresql+asyncpg://{settings.POSTGRES_USER}:"
@@ -7,5 +13,46 @@ DATABASE_URL = (f"postgresql+asyncpg://{settings.POSTGRES_USER}:"
                 f"{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
                 )
 
-engine = create_async_engine(DATABASE_URL)
+checkout_wait = Histogram(
+    'db_pool_checkout_seconds', 'Time spent waiting for a DB connection from the pool',
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+checkout_timeouts = Counter('db_pool_checkout_timeouts_total', 'Pool checkouts that hit DB_POOL_TIMEOUT')
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Пул соединений, который замеряет ожидание свободного соединения"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            checkout_timeouts.inc()
+            raise
+        finally:
+            checkout_wait.observe(time.perf_counter() - start)
+
+
+engine = create_async_engine(
+    DATABASE_URL,
+    poolclass=InstrumentedPool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    connect_args={
+        'prepared_statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE,
+        'server_settings': {'statement_timeout': str(settings.DB_STATEMENT_TIMEOUT_MS)},
+    },
+)
 async_session = async_sessionmaker(engine, expire_on_commit=False)
+
+pool_checked_out = Gauge(
+    'db_pool_checked_out', 'DB connections currently checked out', function=lambda: engine.pool.checkedout()
+)
+pool_saturation = Gauge(
+    'db_pool_saturation', 'Share of the pool capacity (size + overflow) in use',
+    function=lambda: engine.pool.checkedout() / (settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW),
+)
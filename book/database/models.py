@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, BIGINT
+from sqlalchemy import Column, Integer, String, ForeignKey, BIGINT, Float, Index, LargeBinary
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -25,14 +26,23 @@ class UserProgress(Base):
     user = relationship("User", back_populates="progress")
     book = relationship("Book", back_populates="user_progress")
 
+    __table_args__ = (
+        Index('ix_user_progress_user_id_book_id', 'user_id', 'book_id', unique=True),
+    )
+
 
 class Book(Base):
     __tablename__ = 'books'
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String, unique=True, index=True)
+    page_count = Column(Integer, nullable=False, default=0, server_default='0')
+    page_codec = Column(String(10), nullable=True)
+    page_dictionary = Column(LargeBinary, nullable=True)
+    page_store_checksum = Column(String(64), nullable=True)
     bookmarks = relationship("BookMark", back_populates="books")
     book_page = relationship("BookPage", back_populates="book_pages")
     user_progress = relationship("UserProgress", back_populates="book")
+    source_file = relationship("BookFile", back_populates="book", uselist=False)
 
     def __repr__(self):
         return f"{self.name}"
@@ -43,14 +53,54 @@ class BookMark(Base):
     bookmark_id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(BIGINT, ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False)
     book_id = Column(Integer, ForeignKey('books.id', ondelete='CASCADE'), nullable=False)
-    book_page = Column(Integer, ForeignKey('book_page.id', ondelete='CASCADE'), nullable=False)
+    # Устаревшая ссылка на строку страницы: закладка хранит page_no и переживает перезагрузку книги
+    book_page = Column(Integer, ForeignKey('book_page.id', ondelete='SET NULL'), nullable=True)
+    page_no = Column(Integer, nullable=False)
+    snippet = Column(String(100), nullable=False)
     user = relationship('User', back_populates='bookmarks')
     books = relationship('Book', back_populates='bookmarks')
 
+    __table_args__ = (
+        Index('ix_bookmarks_user_id_bookmark_id', 'user_id', 'bookmark_id'),
+    )
+
 
 class BookPage(Base):
     __tablename__ = "book_page"
     id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     text = Column(String)
+    text_z = Column(LargeBinary, nullable=True)
     book_id = Column(Integer, ForeignKey('books.id'), nullable=False)
+    page_no = Column(Integer, nullable=False)
+    search_vector = Column(TSVECTOR, nullable=True)
     book_pages = relationship('Book', back_populates='book_page')
+
+    __table_args__ = (
+        Index('ix_book_page_book_id_page_no', 'book_id', 'page_no', unique=True),
+        Index('ix_book_page_search_vector', 'search_vector', postgresql_using='gin'),
+    )
+
+
+class BookFile(Base):
+    __tablename__ = "book_files"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    file_name = Column(String, unique=True, index=True, nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    size = Column(BIGINT, nullable=False)
+    mtime = Column(Float, nullable=False)
+    book_id = Column(Integer, ForeignKey('books.id', ondelete='CASCADE'), nullable=False)
+    book = relationship('Book', back_populates='source_file')
+
+
+class TocEntry(Base):
+    __tablename__ = "book_toc"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    book_id = Column(Integer, ForeignKey('books.id', ondelete='CASCADE'), nullable=False)
+    ordinal = Column(Integer, nullable=False)
+    title = Column(String, nullable=False)
+    level = Column(Integer, nullable=False, default=1)
+    page_no = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index('ix_book_toc_book_id_ordinal', 'book_id', 'ordinal', unique=True),
+    )
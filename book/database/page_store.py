@@ -0,0 +1,132 @@
+import hashlib
+import mmap
+import os
+from array import array
+
+from sqlalchemy import select
+
+from config_data.config import settings
+from database.cache import book_versions
+from database.database import async_session
+from database.models import Book
+
+
+def _paths(directory: str, book_id: int, checksum: str) -> tuple[str, str]:
+    # Контрольная сумма в имени: новая версия книги не затирает файлы, которые сейчас читаются
+    base = os.path.join(directory, f'{book_id}-{checksum[:16]}')
+    return f'{base}.pages', f'{base}.offsets'
+
+
+class PageStoreWriter:
+    """
+    Записывает страницы книги в один файл UTF-8 подряд и массив смещений
+    начала страниц в отдельный файл. Методы блокирующие, вызываются из потока
+    """
+
+    def __init__(self, directory: str, book_id: int):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.book_id = book_id
+        self._tmp_blob_path = os.path.join(directory, f'{book_id}.pages.tmp')
+        self._blob = open(self._tmp_blob_path, 'wb')
+        self._offsets = array('Q', [0])
+        self._sha256 = hashlib.sha256()
+        self._paths: tuple[str, str] | None = None
+
+    def append(self, pages: list[str]):
+        for page_text in pages:
+            data = page_text.encode('utf-8')
+            self._blob.write(data)
+            self._sha256.update(data)
+            self._offsets.append(self._offsets[-1] + len(data))
+
+    def finish(self) -> str:
+        """Переносит файлы на постоянное место и возвращает контрольную сумму книги"""
+        self._blob.close()
+        self._sha256.update(self._offsets.tobytes())
+        checksum = self._sha256.hexdigest()
+        blob_path, offsets_path = self._paths = _paths(self.directory, self.book_id, checksum)
+        with open(f'{offsets_path}.tmp', 'wb') as file:
+            self._offsets.tofile(file)
+        os.replace(f'{offsets_path}.tmp', offsets_path)
+        os.replace(self._tmp_blob_path, blob_path)
+        return checksum
+
+    def abort(self):
+        self._blob.close()
+        for path in (self._tmp_blob_path, *(self._paths or ())):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def remove_book_files(directory: str, book_id: int, keep_checksum: str | None = None):
+    """Удаляет файлы прежних версий книги после фиксации новой версии в БД"""
+    if not os.path.isdir(directory):
+        return
+    keep = set(_paths(directory, book_id, keep_checksum)) if keep_checksum else set()
+    prefix = f'{book_id}-'
+    for file_name in os.listdir(directory):
+        path = os.path.join(directory, file_name)
+        if file_name.startswith(prefix) and path not in keep:
+            os.remove(path)
+
+
+class PageStore:
+    """
+    Чтение страниц из файлов книг через mmap. Текст страницы декодируется
+    прямо из отображенной памяти, без промежуточной копии bytes
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._books: dict[int, tuple[mmap.mmap | None, array]] = {}
+        self._db_books: set[int] = set()
+
+    async def is_stored(self, book_id: int) -> bool:
+        """Хранится ли текст книги в файлах, а не в book_page"""
+        if book_id in self._books:
+            return True
+        if book_id in self._db_books:
+            return False
+
+        version = book_versions.get(book_id)
+        async with async_session() as session:
+            result = await session.execute(select(Book.page_store_checksum).where(Book.id == book_id))
+            checksum = result.scalar_one_or_none()
+        if book_versions.get(book_id) != version:
+            # Книгу перезагрузили во время запроса: файлы прежней версии уже могли удалить
+            return await self.is_stored(book_id)
+        if checksum is None:
+            self._db_books.add(book_id)
+            return False
+        self._books[book_id] = self._open(book_id, checksum)
+        return True
+
+    def _open(self, book_id: int, checksum: str) -> tuple[mmap.mmap | None, array]:
+        blob_path, offsets_path = _paths(self.directory, book_id, checksum)
+        offsets = array('Q')
+        with open(offsets_path, 'rb') as file:
+            offsets.frombytes(file.read())
+        with open(blob_path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if size != offsets[-1]:
+                raise RuntimeError(f'Page store of book {book_id} is corrupted: {blob_path}')
+            # Пустой файл отобразить нельзя, у книги без страниц нет и данных
+            blob = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        return blob, offsets
+
+    def get(self, book_id: int, page_no: int) -> str | None:
+        blob, offsets = self._books[book_id]
+        if blob is None or not 0 <= page_no < len(offsets) - 1:
+            return None
+        with memoryview(blob)[offsets[page_no]:offsets[page_no + 1]] as data:
+            return str(data, 'utf-8')
+
+    def invalidate_book(self, book_id: int):
+        self._db_books.discard(book_id)
+        blob, _ = self._books.pop(book_id, (None, None))
+        if blob is not None:
+            blob.close()
+
+
+page_store = PageStore(settings.PAGE_STORE_DIR)
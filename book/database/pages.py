@@ -0,0 +1,131 @@
+import time
+
+from sqlalchemy import select
+
+from config_data.config import settings
+from database.cache import book_versions, page_cache
+from database.compression import ZlibCodec, ZstdCodec, make_codec
+from database.database import async_session
+from database.models import Book, BookPage
+from database.page_store import page_store
+from services.metrics import Histogram
+
+
+page_decode_time = Histogram(
+    'page_decode_seconds', 'Time spent decompressing one page',
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01),
+)
+
+# Кодеки сжатых книг: book_id -> кодек со словарем книги
+_book_codecs: dict[int, ZlibCodec | ZstdCodec] = {}
+# Число страниц книг: book_id -> page_count
+_page_counts: dict[int, int] = {}
+
+
+async def _get_codec(book_id: int) -> ZlibCodec | ZstdCodec:
+    codec = _book_codecs.get(book_id)
+    if codec is None:
+        version = book_versions.get(book_id)
+        async with async_session() as session:
+            result = await session.execute(
+                select(Book.page_codec, Book.page_dictionary).where(Book.id == book_id)
+            )
+            codec_name, dictionary = result.one()
+        codec = make_codec(codec_name, settings.PAGE_COMPRESSION_LEVEL, dictionary)
+        if book_versions.get(book_id) == version:
+            _book_codecs[book_id] = codec
+    return codec
+
+
+def invalidate_book_codec(book_id: int):
+    _book_codecs.pop(book_id, None)
+
+
+async def _decode(book_id: int, data: bytes) -> str:
+    codec = await _get_codec(book_id)
+    start = time.perf_counter()
+    page_text = codec.decompress(data)
+    page_decode_time.observe(time.perf_counter() - start)
+    return page_text
+
+
+async def get_page(book_id: int, page_no: int) -> str | None:
+    """
+    Текст одной страницы книги по ключу (book_id, page_no): из кэша,
+    из файлов книги, если она хранится в них, или из БД
+    """
+    if await page_store.is_stored(book_id):
+        # Файл уже в страничном кэше ОС, отдельный кэш не нужен
+        return page_store.get(book_id, page_no)
+
+    cached = page_cache.get(book_id, page_no)
+    if isinstance(cached, bytes):
+        return await _decode(book_id, cached)
+    if cached is not None:
+        return cached
+
+    # Книгу могут перезагрузить, пока идет запрос: тогда прочитанное в кэш не кладется
+    version = book_versions.get(book_id)
+    async with async_session() as session:
+        result = await session.execute(
+            select(BookPage.text, BookPage.text_z)
+            .where(BookPage.book_id == book_id, BookPage.page_no == page_no)
+        )
+        row = result.one_or_none()
+
+    if row is None:
+        return None
+    if row.text_z is None:
+        page_text = row.text
+        if page_text is not None and book_versions.get(book_id) == version:
+            page_cache.put(book_id, page_no, page_text)
+        return page_text
+    page_text = await _decode(book_id, row.text_z)
+    if book_versions.get(book_id) == version:
+        # При PAGE_CACHE_COMPRESSED в кэше хранятся сжатые страницы: больше страниц на тот же бюджет
+        page_cache.put(book_id, page_no, row.text_z if settings.PAGE_CACHE_COMPRESSED else page_text)
+    return page_text
+
+
+async def get_page_count(book_id: int) -> int | None:
+    """
+    Количество страниц книги или None, если книги нет. Запоминается
+    до перезагрузки книги, чтобы листание из кэша не ходило в БД
+    """
+    page_count = _page_counts.get(book_id)
+    if page_count is not None:
+        return page_count
+
+    version = book_versions.get(book_id)
+    async with async_session() as session:
+        result = await session.execute(select(Book.page_count).where(Book.id == book_id))
+        page_count = result.scalar_one_or_none()
+    if page_count is not None and book_versions.get(book_id) == version:
+        _page_counts[book_id] = page_count
+    return page_count
+
+
+def invalidate_book_page_count(book_id: int):
+    _page_counts.pop(book_id, None)
+
+
+async def prefetch_pages(book_id: int, start: int, stop: int):
+    """Загружает в кэш страницы [start, stop) одним запросом"""
+    if await page_store.is_stored(book_id):
+        return
+
+    version = book_versions.get(book_id)
+    async with async_session() as session:
+        result = await session.execute(
+            select(BookPage.page_no, BookPage.text, BookPage.text_z)
+            .where(BookPage.book_id == book_id, BookPage.page_no >= start, BookPage.page_no < stop)
+        )
+        pages = result.all()
+
+    for page_no, page_text, text_z in pages:
+        if text_z is not None:
+            page_text = text_z if settings.PAGE_CACHE_COMPRESSED else await _decode(book_id, text_z)
+        if book_versions.get(book_id) != version:
+            return
+        if page_text is not None:
+            page_cache.put(book_id, page_no, page_text)
@@ -1,5 +1,7 @@
 from aiogram.filters import BaseFilter
-from aiogram.types import CallbackQuery
+from aiogram.types import CallbackQuery, Message
+
+from config_data.config import settings
 
 
 class IsDigitCallbackData(BaseFilter):
@@ -12,3 +14,9 @@ class IsDelBookmarkCallbackData(BaseFilter):
     """Фильтр, проверяющий, что данные начинаются с цифр и заканчиваются на 'del'"""
     async def __call__(self, callback: CallbackQuery) -> bool:
         return callback.data.endswith('del') and callback.data[:-3].isdigit()
+
+
+class IsAdmin(BaseFilter):
+    """Фильтр, пропускающий только администраторов из ADMIN_IDS"""
+    async def __call__(self, message: Message) -> bool:
+        return message.from_user.id in settings.admin_ids
@@ -0,0 +1,62 @@
+import asyncio
+from html import escape
+
+from aiogram import Router
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from filters.filters import IsAdmin
+from messages.messages import LEXICON
+from services.write_book_in_db import IngestProgress, book_writer
+
+
+PROGRESS_REPORT_INTERVAL = 3.0
+
+router = Router()
+router.message.filter(IsAdmin())
+
+# Ссылки на фоновые задачи, чтобы их не собрал сборщик мусора
+_report_tasks: set[asyncio.Task] = set()
+
+
+def _format_progress(progress: IngestProgress, finished: bool) -> str:
+    values = {
+        'done': progress.files_done,
+        'total': progress.files_total,
+        'failed': progress.files_failed,
+        'pages': progress.pages,
+        'speed': progress.pages_per_second,
+        'elapsed': progress.elapsed,
+    }
+    text = LEXICON['reindex_done' if finished else 'reindex_progress'].format(**values)
+    if progress.failed_files:
+        text += LEXICON['reindex_errors'].format(files=', '.join(map(escape, progress.failed_files)))
+    return text
+
+
+async def _report_progress(status: Message, scan: asyncio.Task):
+    """Обновляет сообщение с прогрессом, пока идет загрузка книг"""
+    while True:
+        await asyncio.wait({scan}, timeout=PROGRESS_REPORT_INTERVAL)
+        try:
+            await status.edit_text(_format_progress(book_writer.progress, scan.done()))
+        except TelegramBadRequest:
+            # Прогресс не изменился с прошлого обновления
+            pass
+        if scan.done():
+            return
+
+
+@router.message(Command(commands='reindex'))
+async def process_reindex_command(message: Message):
+    """
+    Этот хэндлер будет срабатывать на команду "/reindex" от администратора:
+    запускает проверку папки с книгами в фоне и показывает ее прогресс
+    """
+    running = book_writer.scanning
+    scan = book_writer.start_scan()
+    status = await message.answer(LEXICON['reindex_running' if running else 'reindex_started'])
+    task = asyncio.create_task(_report_progress(status, scan))
+    _report_tasks.add(task)
+    task.add_done_callback(_report_tasks.discard)
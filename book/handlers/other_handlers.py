@@ -1,8 +1,15 @@
+import logging
+
 from aiogram import Router
-from aiogram.types import Message
+from aiogram.filters import ExceptionTypeFilter
+from aiogram.types import ErrorEvent, Message
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
 from messages.messages import LEXICON
 
 
+logger = logging.getLogger(__name__)
+
 router = Router()
 
 
@@ -10,3 +17,16 @@ router = Router()
 async def send_echo(message: Message):
     """Хэндлер для отлова некорректных команд"""
     await message.answer(f'{LEXICON["echo"]}')
+
+
+@router.errors(ExceptionTypeFilter(PoolTimeoutError))
+async def process_pool_timeout(event: ErrorEvent):
+    """
+    Хэндлер для апдейтов, не дождавшихся соединения с БД:
+    пользователь получает короткий ответ вместо молчания
+    """
+    logger.warning('DB pool exhausted while handling update %s', event.update.update_id)
+    if event.update.callback_query is not None:
+        await event.update.callback_query.answer(LEXICON['busy'])
+    elif event.update.message is not None:
+        await event.update.message.answer(LEXICON['busy'])
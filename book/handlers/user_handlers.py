@@ -1,26 +1,41 @@
+from html import escape
+
 from aiogram import F, Router
-from aiogram.filters import Command, CommandStart
+from aiogram.filters import Command, CommandObject, CommandStart
 from aiogram.types import CallbackQuery, Message
 
+from config_data.config import settings
 from database.database import async_session
-from database.models import User, Book, BookPage, UserProgress
+from database.models import Book
+from database.pages import get_page, get_page_count
 
 from filters.filters import IsDelBookmarkCallbackData, IsDigitCallbackData
 from keyboards.bookmarks_kb import create_bookmarks_keyboard, create_edit_keyboard
 from keyboards.books_list_kb import create_books_list_keyboard
+from keyboards.callback_data import BookCallback, BookmarksCallback, PageCallback, SearchCallback, TableCallback
 from keyboards.pagination_kb import create_pagination_keyboard
-from keyboards.table_kb import create_table_keyboard
+from keyboards.search_kb import create_search_keyboard
+from keyboards.table_kb import create_table_keyboard, create_toc_keyboard
 
 from messages.messages import LEXICON
 
 from sqlalchemy import select, text
 
-from services.check_user_in_db import check_user_in_db
-from services.write_book_in_db import BookWriter
+from services.check_user_in_db import check_user_in_db, register_user
+from services.prefetch import prefetcher
+from services.progress import progress_tracker
+from services.reader import current_books, show_page
+from services.search import make_snippet, search_pages, search_queries
+from services.toc import toc_index
 
 
 router = Router()
 
+TABLE_PAGE_SIZE = 96
+TOC_PAGE_SIZE = 20
+BOOKMARKS_PAGE_SIZE = 10
+BOOKMARK_SNIPPET_LENGTH = 100
+
 
 @router.message(CommandStart())
 async def process_start_command(message: Message):
@@ -29,22 +44,10 @@ async def process_start_command(message: Message):
     добавлять пользователя в базу данных, если его там еще не было
     и отправлять ему приветственное сообщение
     """
-    bw = BookWriter()
-    await bw.run()
-    if await check_user_in_db(message=message):
-        await message.answer("Вы уже зарегистрированы, продолжим?")
+    if await register_user(message.from_user):
+        await message.answer("Поздравляю вас с регистрацией!")
     else:
-        async with async_session() as session:
-            query = text(
-                "INSERT INTO users (user_id, username, first_name, last_name) "
-                "VALUES (:user_id, :username, :first_name, :last_name)"
-            )
-            await session.execute(query, {
-                'user_id': message.from_user.id, "username": message.from_user.username,
-                "first_name": message.from_user.first_name, "last_name": message.from_user.last_name
-                })
-            await session.commit()
-            await message.answer("Поздравляю вас с регистрацией!")
+        await message.answer("Вы уже зарегистрированы, продолжим?")
     await message.answer(LEXICON[message.text])
 
 
@@ -62,11 +65,11 @@ async def process_get_books_list(message: Message):
     """
     Этот хэндлер показывает список доступных книг
     """
+    prefetcher.cancel(message.from_user.id)
     async with async_session() as session:
-        query = select(Book)
+        query = select(Book.id, Book.name).order_by(Book.id)
         result = await session.execute(query)
-        all_books = result.scalars().all()
-        books = [book.id for book in all_books]
+        books = tuple(tuple(row) for row in result.all())
 
     await message.answer(
         text=LEXICON["books_list"],
@@ -74,50 +77,45 @@ async def process_get_books_list(message: Message):
     )
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith('read_book_'))
-async def process_book_selection(callback_query: CallbackQuery):
-    _, book_id, page_number = callback_query.data.split('_')
-
-    async with async_session() as session:
-        query = select(Book).where(Book.id == book_id)
-        result = await session.execute(query)
-        book = result.scalars().first()
-
-        if not book:
-            await callback_query.message.answer("Sorry, couldn't find that book.")
-            return
-
-        user = await session.get(User, callback_query.from_user.id)
-
-        if not user:
-            await callback_query.message.answer("You haven't registered yet. Use /start")
-            return
-
-        query_page = select(BookPage).where(BookPage.book_id == book.id)
-        result_out = await session.execute(query_page)
-        pages = result_out.scalars().all()
-
-        progress_result = await session.execute(
-            select(UserProgress)
-            .where(UserProgress.book_id == book.id and UserProgress.user_id == user.id))
-        current_progress = progress_result.scalars().first()
-
-        if current_progress is None:
-            current_progress = UserProgress(last_read_page=0, book_id=book.id, user_id=user.user_id)
-            session.add(current_progress)
-
-        await session.commit()
-
-    page_text = pages[current_progress.last_read_page].text
-
-    await callback_query.message.answer(
+@router.callback_query(BookCallback.filter())
+async def process_book_selection(callback_query: CallbackQuery, callback_data: BookCallback):
+    """
+    Этот хэндлер открывает выбранную книгу на странице,
+    на которой пользователь остановился
+    """
+    book_id = callback_data.book_id
+    user_id = callback_query.from_user.id
+    total_pages = await get_page_count(book_id)
+
+    if total_pages is None:
+        await callback_query.message.answer("Sorry, couldn't find that book.")
+        return
+
+    if not check_user_in_db(user_id):
+        await callback_query.message.answer("You haven't registered yet. Use /start")
+        return
+
+    page = await progress_tracker.get(user_id, book_id)
+    if page is None:
+        page = 0
+        progress_tracker.set(user_id, book_id, page)
+    elif page >= total_pages > 0:
+        # Книгу перезагрузили, и в новой версии меньше страниц
+        page = total_pages - 1
+        progress_tracker.set(user_id, book_id, page)
+
+    page_text = await get_page(book_id, page)
+    if page_text is None:
+        await callback_query.message.answer("Sorry, couldn't find that book.")
+        return
+
+    prefetcher.schedule(user_id, book_id, page, total_pages)
+    await show_page(
+        callback_query,
         text=page_text,
-        reply_markup=create_pagination_keyboard(
-            "before" if current_progress.last_read_page > 0 else "...",
-            f"{current_progress.last_read_page + 1} / {len(pages)}",
-            "after" if current_progress.last_read_page < len(pages) - 1 else "...",
-            "bookmarks",
-        )
+        reply_markup=create_pagination_keyboard(book_id, page, total_pages),
+        reuse_last=True,
+        book_id=book_id,
     )
 
 
@@ -128,18 +126,21 @@ async def process_continue_reading(message: Message):
     и отправлять пользователю страницу книги, на которой пользователь
     остановился в процессе взаимодействия с ботом
     """
+    prefetcher.cancel(message.from_user.id)
+    user_id = message.from_user.id
+    # Книги, открытые совсем недавно, могут быть еще только в буфере прогресса
+    unsaved_books = progress_tracker.unsaved_books(user_id)
     async with async_session() as session:
-        user_id = message.from_user.id
         query = text(
-            f"""
-            SELECT b.name
-            FROM user_progress AS u_p
-            INNER JOIN books AS b ON b.id = u_p.book_id
-            WHERE u_p.user_id = {user_id}
+            """
+            SELECT b.id, b.name
+            FROM books AS b
+            WHERE b.id IN (SELECT u_p.book_id FROM user_progress AS u_p WHERE u_p.user_id = :user_id)
+               OR b.id = ANY(:unsaved_books)
             """
         )
-        result = await session.execute(query)
-        books = result.scalars().all()
+        result = await session.execute(query, {'user_id': user_id, 'unsaved_books': unsaved_books})
+        books = tuple(tuple(row) for row in result.all())
 
         await message.answer(
             text=LEXICON["users_books"],
@@ -147,128 +148,97 @@ async def process_continue_reading(message: Message):
         )
 
 
-@router.callback_query(F.data == 'after')
-async def process_forward_press(callback_query: CallbackQuery):
+@router.callback_query(PageCallback.filter(F.action.in_({'after', 'before', 'open'})))
+async def process_page_turn(callback_query: CallbackQuery, callback_data: PageCallback):
     """
-    Этот хэндлер будет срабатывать на нажатие инлайн-кнопки "вперед"
-    во время взаимодействия пользователя с сообщением-книгой
+    Этот хэндлер будет срабатывать на нажатие инлайн-кнопок "вперед" и "назад"
+    во время взаимодействия пользователя с сообщением-книгой, а также
+    на переход к странице из оглавления
     """
-    async with async_session() as session:
-        result = await session.execute(
-            select(BookPage)
-            .where(BookPage.text.contains(callback_query.message.text[:30]))
-        )
-        current_page = result.scalars().first()
-
-        progress_result = await session.execute(
-            select(UserProgress).
-            where(UserProgress.user_id == callback_query.from_user.id,
-                  UserProgress.book_id == current_page.book_id)
-        )
-        progress = progress_result.scalars().first()
-        book_id = progress.book_id
-
-        pages_list = await session.execute(
-            select(BookPage)
-            .where(BookPage.book_id == current_page.book_id)
-        )
-        pages = pages_list.scalars().all()
-
-        page = progress.last_read_page
-        if page < len(pages) - 1:
-            current_page = pages[page + 1]
-
-            progress.last_read_page += 1
-            session.add(progress)
-        else:
-            current_page = pages[page]
-
-        await session.commit()
-
-    await callback_query.message.answer(
-        text=current_page.text,
-        reply_markup=create_pagination_keyboard(
-            "before" if page > 0 else '...',
-            f"{page + 1} / {len(pages)}",
-            "after" if page < len(pages) - 1 else '...',
-            "bookmarks",
-        )
+    page = callback_data.page
+    if callback_data.action == 'after':
+        page += 1
+    elif callback_data.action == 'before':
+        page -= 1
+
+    total_pages = await get_page_count(callback_data.book_id) or 0
+    page = max(0, min(page, total_pages - 1))
+    page_text = await get_page(callback_data.book_id, page)
+    if page_text is None:
+        await callback_query.answer()
+        return
+
+    progress_tracker.set(callback_query.from_user.id, callback_data.book_id, page)
+    prefetcher.schedule(callback_query.from_user.id, callback_data.book_id, page, total_pages)
+    await show_page(
+        callback_query,
+        text=page_text,
+        reply_markup=create_pagination_keyboard(callback_data.book_id, page, total_pages),
+        book_id=callback_data.book_id,
     )
 
 
-@router.callback_query(F.data == 'before')
-async def process_backward_press(callback_query: CallbackQuery):
+@router.callback_query(PageCallback.filter(F.action == 'mark'))
+async def process_page_press(callback: CallbackQuery, callback_data: PageCallback):
     """
-    Этот хэндлер будет срабатывать на нажатие инлайн-кнопки "назад"
-    во время взаимодействия пользователя с сообщением-книгой
+    Этот хэндлер будет срабатывать на нажатие инлайн-кнопки
+    с номером текущей страницы и добавлять текущую страницу в закладки
     """
-    async with async_session() as session:
-        result = await session.execute(
-            select(BookPage)
-            .where(BookPage.text.contains(callback_query.message.text[:30]))
-        )
-        current_page = result.scalars().first()
-
-        progress_result = await session.execute(
-            select(UserProgress).
-            where(UserProgress.user_id == callback_query.from_user.id,
-                  UserProgress.book_id == current_page.book_id)
-        )
-        progress = progress_result.scalars().first()
-        book_id = progress.book_id
+    user_id = callback.from_user.id
+    page_text = await get_page(callback_data.book_id, callback_data.page)
+    if page_text is None:
+        await callback.answer()
+        return
 
-        pages_list = await session.execute(
-            select(BookPage)
-            .where(BookPage.book_id == current_page.book_id)
+    async with async_session() as session:
+        query = text(
+            "INSERT INTO bookmarks (user_id, book_id, page_no, snippet)"
+            "VALUES (:user_id, :book_id, :page_no, :snippet)"
         )
-        pages = pages_list.scalars().all()
-
-        page = progress.last_read_page
-        if page > 0:
-            current_page = pages[page - 1]
-
-            progress.last_read_page -= 1
-            session.add(progress)
-        else:
-            current_page = pages[page]
-
+        await session.execute(query, {
+            'user_id': user_id, 'book_id': callback_data.book_id,
+            'page_no': callback_data.page, 'snippet': ' '.join(page_text[:BOOKMARK_SNIPPET_LENGTH * 2].split())[:BOOKMARK_SNIPPET_LENGTH]
+        })
         await session.commit()
 
-    await callback_query.message.answer(
-        text=current_page.text,
-        reply_markup=create_pagination_keyboard(
-            "before" if page > 0 else '...',
-            f"{page - 1} / {len(pages)}",
-            "after" if page < len(pages) - 1 else '...',
-            "/bookmarks",
-        )
-    )
+    await callback.answer('Страница добавлена в закладки!')
 
 
-@router.callback_query(lambda x: '/' in x.data and x.data.replace(' / ', '').isdigit())
-async def process_page_press(callback: CallbackQuery):
+async def _get_bookmarks_page(user_id: int, direction: str = 'next', cursor: int = 0):
     """
-    Этот хэндлер будет срабатывать на нажатие инлайн-кнопки
-    с номером текущей страницы и добавлять текущую страницу в закладки
+    Порция закладок пользователя по ключу bookmark_id и курсоры
+    для соседних порций (None, если в эту сторону закладок нет)
     """
-    page_text = callback.message.text[:60]
-    user_id = callback.from_user.id
-    async with async_session() as session:
+    if direction == 'next':
         query = text(
-            "SELECT b_p.id, b_p.book_id "
-            "FROM book_page AS b_p "
-            "WHERE b_p.text LIKE :page_text "
+            "SELECT bookmark_id, page_no, snippet FROM bookmarks "
+            "WHERE user_id = :user_id AND bookmark_id > :cursor "
+            "ORDER BY bookmark_id LIMIT :limit"
         )
-        result = await session.execute(query, {'page_text': f'%{page_text}%'})
-        result_info = result.fetchone()
+    else:
         query = text(
-            "INSERT INTO bookmarks (user_id, book_id, book_page)"
-            "VALUES (:user_id, :book_id, :book_page)"
+            "SELECT bookmark_id, page_no, snippet FROM bookmarks "
+            "WHERE user_id = :user_id AND bookmark_id < :cursor "
+            "ORDER BY bookmark_id DESC LIMIT :limit"
         )
-        await session.execute(query, {'user_id': user_id, 'book_id': result_info[1], 'book_page' : result_info[0]})
-        await session.commit()
+    async with async_session() as session:
+        result = await session.execute(
+            query, {'user_id': user_id, 'cursor': cursor, 'limit': BOOKMARKS_PAGE_SIZE + 1}
+        )
+        bookmarks = result.all()
 
-    await callback.answer('Страница добавлена в закладки!')
+    has_more = len(bookmarks) > BOOKMARKS_PAGE_SIZE
+    bookmarks = bookmarks[:BOOKMARKS_PAGE_SIZE]
+    if direction == 'next':
+        has_prev, has_next = cursor > 0, has_more
+    else:
+        bookmarks.reverse()
+        has_prev, has_next = has_more, True
+    if not bookmarks:
+        return bookmarks, None, None
+    prev_cursor = bookmarks[0].bookmark_id if has_prev else None
+    next_cursor = bookmarks[-1].bookmark_id if has_next else None
+    return bookmarks, prev_cursor, next_cursor
 
 
 @router.message(Command(commands="bookmarks"))
@@ -278,25 +248,41 @@ async def process_bookmarks_command(message: Message):
     и отправлять пользователю список сохраненных закладок,
     если они есть или сообщение о том, что закладок нет
     """
-    user_id = message.from_user.id
-    async with async_session() as session:
-        query = text(
-            "SELECT b_m.bookmark_id, b_p.text "
-            "FROM bookmarks AS b_m "
-            "INNER JOIN book_page AS b_p ON b_p.id = b_m.book_page "
-            "WHERE b_m.user_id = :user_id "
-        )
-        result = await session.execute(query, {'user_id': user_id})
-        bookmarks = result.all()
-        if len(bookmarks) > 0:
-            await message.answer(
-                text=LEXICON['/bookmarks'],
-                reply_markup=create_bookmarks_keyboard(
-                    bookmarks
-                )
+    prefetcher.cancel(message.from_user.id)
+    bookmarks, prev_cursor, next_cursor = await _get_bookmarks_page(message.from_user.id)
+    if len(bookmarks) > 0:
+        await message.answer(
+            text=LEXICON['/bookmarks'],
+            reply_markup=create_bookmarks_keyboard(
+                bookmarks, prev_cursor, next_cursor
             )
-        else:
-            await message.answer(text=LEXICON['no_bookmarks'])
+        )
+    else:
+        await message.answer(text=LEXICON['no_bookmarks'])
+
+
+@router.callback_query(F.data.in_({'bookmarks', '/bookmarks'}))
+@router.callback_query(BookmarksCallback.filter())
+async def process_bookmarks_list_press(callback: CallbackQuery, callback_data: BookmarksCallback | None = None):
+    """
+    Этот хэндлер будет срабатывать на кнопку "Закладки" под страницей книги,
+    на возврат к закладкам и на листание списка закладок
+    """
+    prefetcher.cancel(callback.from_user.id)
+    if callback_data is None:
+        bookmarks, prev_cursor, next_cursor = await _get_bookmarks_page(callback.from_user.id)
+    else:
+        bookmarks, prev_cursor, next_cursor = await _get_bookmarks_page(
+            callback.from_user.id, callback_data.direction, callback_data.cursor
+        )
+    if len(bookmarks) > 0:
+        await show_page(
+            callback,
+            text=LEXICON['/bookmarks'],
+            reply_markup=create_bookmarks_keyboard(bookmarks, prev_cursor, next_cursor),
+        )
+    else:
+        await callback.answer(LEXICON['no_bookmarks'], show_alert=True)
 
 
 @router.callback_query(IsDigitCallbackData())
@@ -309,21 +295,25 @@ async def process_bookmark_press(callback: CallbackQuery):
 
     async with async_session() as session:
         query = text(
-            "SELECT b_p.text "
-            "FROM book_page AS b_p "
-            "WHERE b_p.id = :bookmark_id "
+            "SELECT book_id, page_no "
+            "FROM bookmarks "
+            "WHERE bookmark_id = :bookmark_id AND user_id = :user_id "
         )
-        result = await session.execute(query, {'bookmark_id': bookmark_id})
+        result = await session.execute(query, {'bookmark_id': bookmark_id, 'user_id': callback.from_user.id})
         info = result.fetchone()
-        page_text = str(info)
 
-    buttons = [bookmark_id, page_text]
+    if info is None:
+        await callback.answer()
+        return
+    page_text = await get_page(info.book_id, info.page_no)
+    if page_text is None:
+        await callback.answer()
+        return
 
-    await callback.message.answer(
+    await show_page(
+        callback,
         text=page_text,
-        reply_markup=create_edit_keyboard(
-            buttons,
-        )
+        reply_markup=create_edit_keyboard(bookmark_id, info.book_id, info.page_no),
     )
 
 
@@ -333,6 +323,7 @@ async def process_cancel_press(callback: CallbackQuery):
     Этот хэндлер будет срабатывать на нажатие инлайн-кнопки
     "отменить" во время работы со списком закладок (просмотр и редактирование)
     """
+    prefetcher.cancel(callback.from_user.id)
     await callback.message.edit_text(text=LEXICON['cancel_text'])
 
 
@@ -345,38 +336,96 @@ async def process_del_bookmark_press(callback: CallbackQuery):
     bookmark_id = int(callback.data[:-3])
     async with async_session() as session:
         query = text(
-            "DELETE FROM bookmarks WHERE bookmark_id = :bookmark_id "
+            "DELETE FROM bookmarks WHERE bookmark_id = :bookmark_id AND user_id = :user_id "
         )
-        await session.execute(query, {'bookmark_id': bookmark_id})
+        await session.execute(query, {'bookmark_id': bookmark_id, 'user_id': callback.from_user.id})
         await session.commit()
     await callback.answer('Запись удалена!')
 
 
-@router.callback_query(F.data.startswith('nav_'))
-async def navigate_pages(callback: CallbackQuery):
-    _, page = callback.data.split('_')
-    page = int(page)
-    print(page)
-    page_text = callback.message.text[:60]
-    async with async_session() as session:
-        query = text(
-            "SELECT b_p.id FROM book_page AS b_p "
-            "WHERE b_p.book_id IN "
-                "(SELECT b_p.book_id "
-                "FROM book_page AS b_p "
-                "WHERE b_p.text LIKE :page_text)"
+@router.callback_query(TableCallback.filter())
+async def navigate_pages(callback: CallbackQuery, callback_data: TableCallback):
+    """
+    Этот хэндлер показывает оглавление книги - список глав или,
+    если глав в книге не нашлось, страницу с номерами страниц книги
+    """
+    entries = await toc_index.get(callback_data.book_id)
+    if entries:
+        total_pages = max(1, -(-len(entries) // TOC_PAGE_SIZE))
+        page = max(1, min(callback_data.page, total_pages))
+        start = (page - 1) * TOC_PAGE_SIZE
+        reply_markup = create_toc_keyboard(
+            callback_data.book_id, tuple(entries[start:start + TOC_PAGE_SIZE]),
+            current_page=page, total_pages=total_pages
         )
-        result = await session.execute(query, {'page_text': f'%{page_text}%'})
-        book_page_ids = result.scalars().all()
-    total_pages = (len(book_page_ids) // 98) + 1
-    counter = (page * 99) - 98
-    if page > 1:
-        buttons = book_page_ids[page * 99:]
     else:
-        buttons = book_page_ids[:page * 99]
-    await callback.message.answer(
-        text=LEXICON['table'],
-        reply_markup=create_table_keyboard(
-            buttons=buttons, current_page=page, total_pages=total_pages, counter=counter
+        total = await get_page_count(callback_data.book_id) or 0
+        total_pages = max(1, -(-total // TABLE_PAGE_SIZE))
+        page = max(1, min(callback_data.page, total_pages))
+        start = (page - 1) * TABLE_PAGE_SIZE
+        reply_markup = create_table_keyboard(
+            callback_data.book_id, range(start, min(start + TABLE_PAGE_SIZE, total)),
+            current_page=page, total_pages=total_pages
         )
+    await show_page(callback, text=LEXICON['table'], reply_markup=reply_markup)
+
+
+async def _render_search_results(user_id: int, after: tuple[float, int] | None = None):
+    query, book_id = search_queries[user_id]
+    hits, has_more = await search_pages(
+        query, book_id=book_id, after=after, limit=settings.SEARCH_RESULTS_PER_PAGE
+    )
+    if not hits:
+        return LEXICON['search_nothing'], None
+
+    lines = [LEXICON['search_results']]
+    for number, hit in enumerate(hits, start=1):
+        page_text = await get_page(hit.book_id, hit.page_no) or ''
+        lines.append(
+            f'\n{number}. <b>{escape(hit.name)}</b>, стр. {hit.page_no + 1}\n'
+            f'{escape(make_snippet(page_text, query))}'
+        )
+    next_cursor = (hits[-1].rank, hits[-1].id) if has_more else None
+    return '\n'.join(lines), create_search_keyboard(hits, next_cursor)
+
+
+@router.message(Command(commands=['search', 'search_book']))
+async def process_search_command(message: Message, command: CommandObject):
+    """
+    Этот хэндлер будет срабатывать на команды "/search" и "/search_book"
+    и искать страницы с указанными словами во всех книгах или в текущей книге
+    """
+    if not command.args:
+        await message.answer(LEXICON['search_usage'])
+        return
+
+    book_id = None
+    if command.command == 'search_book':
+        book_id = current_books.get(message.from_user.id)
+        if book_id is None:
+            await message.answer(LEXICON['search_no_book'])
+            return
+
+    search_queries[message.from_user.id] = (command.args, book_id)
+    results_text, reply_markup = await _render_search_results(message.from_user.id)
+    await message.answer(text=results_text, reply_markup=reply_markup)
+
+
+@router.callback_query(SearchCallback.filter())
+async def process_search_more_press(callback: CallbackQuery, callback_data: SearchCallback):
+    """
+    Этот хэндлер будет срабатывать на нажатие кнопки "еще"
+    и показывать следующую порцию результатов поиска
+    """
+    if callback.from_user.id not in search_queries:
+        await callback.answer(LEXICON['search_usage'])
+        return
+    results_text, reply_markup = await _render_search_results(
+        callback.from_user.id, after=(callback_data.rank, callback_data.page_id)
     )
+    if results_text == LEXICON['search_nothing']:
+        # Страницы после курсора пропали (книгу удалили или перезалили) - прежние результаты не трогаем
+        await callback.answer(results_text)
+        return
+    await callback.message.edit_text(text=results_text, reply_markup=reply_markup)
+    await callback.answer()
@@ -1,17 +1,33 @@
 from typing import List
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from keyboards.callback_data import BookmarksCallback, PageCallback
 from messages.messages import LEXICON
 
 
-def create_bookmarks_keyboard(buttons_list: List) -> InlineKeyboardMarkup:
+def create_bookmarks_keyboard(buttons_list: List, prev_cursor: int | None = None,
+                              next_cursor: int | None = None) -> InlineKeyboardMarkup:
+    """buttons_list - строки (bookmark_id, номер страницы, начало текста страницы)"""
     kb_builder = InlineKeyboardBuilder()
     for button in buttons_list:
         callback_data = f"{button[0]}"
         kb_builder.row(InlineKeyboardButton(
-            text=f'{button[0]} - {button[1][:100]}',
+            text=f'{button[1] + 1} - {button[2]}',
             callback_data=callback_data
         ))
+    navigation = []
+    if prev_cursor is not None:
+        navigation.append(InlineKeyboardButton(
+            text=LEXICON['before'],
+            callback_data=BookmarksCallback(direction='prev', cursor=prev_cursor).pack()
+        ))
+    if next_cursor is not None:
+        navigation.append(InlineKeyboardButton(
+            text=LEXICON['after'],
+            callback_data=BookmarksCallback(direction='next', cursor=next_cursor).pack()
+        ))
+    if navigation:
+        kb_builder.row(*navigation)
     kb_builder.row(
         InlineKeyboardButton(
             text=LEXICON['cancel'],
@@ -22,13 +38,16 @@ def create_bookmarks_keyboard(buttons_list: List) -> InlineKeyboardMarkup:
     return kb_builder.as_markup()
 
 
-def create_edit_keyboard(*args) -> InlineKeyboardMarkup:
+def create_edit_keyboard(bookmark_id: int, book_id: int, page_no: int) -> InlineKeyboardMarkup:
     kb_builder = InlineKeyboardBuilder()
-    for button in args:
-        kb_builder.row(InlineKeyboardButton(
-            text=f'{LEXICON['del']} DELETE {LEXICON['del']}',
-            callback_data=f'{button[0]}del'
-        ))
+    kb_builder.row(InlineKeyboardButton(
+        text='Читать с этой страницы',
+        callback_data=PageCallback(action='open', book_id=book_id, page=page_no).pack()
+    ))
+    kb_builder.row(InlineKeyboardButton(
+        text=f'{LEXICON['del']} DELETE {LEXICON['del']}',
+        callback_data=f'{bookmark_id}del'
+    ))
     kb_builder.row(
         InlineKeyboardButton(
             text=LEXICON['cancel'],
@@ -1,12 +1,15 @@
-from typing import List
+from typing import Tuple
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from keyboards.callback_data import BookCallback
+from keyboards.keyboard_cache import cached_keyboard
 
 
-def create_books_list_keyboard(buttons: List[str]) -> InlineKeyboardMarkup:
+@cached_keyboard(book_id_arg=False)
+def create_books_list_keyboard(books: Tuple[Tuple[int, str], ...]) -> InlineKeyboardMarkup:
     kb_builder = InlineKeyboardBuilder()
     kb_builder.row(*[InlineKeyboardButton(
-        text=button,
-        callback_data=f"read_book_{button}") for button in buttons]
+        text=name,
+        callback_data=BookCallback(book_id=book_id).pack()) for book_id, name in books]
     )
     return kb_builder.as_markup()
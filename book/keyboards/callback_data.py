@@ -0,0 +1,37 @@
+from aiogram.filters.callback_data import CallbackData
+
+
+class BookCallback(CallbackData, prefix='book'):
+    """Выбор книги из списка"""
+    book_id: int
+
+
+class PageCallback(CallbackData, prefix='pg'):
+    """
+    Действие со страницей книги: after/before - листание,
+    mark - добавление в закладки, open - переход к странице
+    """
+    action: str
+    book_id: int
+    page: int
+
+
+class TableCallback(CallbackData, prefix='nav'):
+    """Страница оглавления книги"""
+    book_id: int
+    page: int
+
+
+class SearchCallback(CallbackData, prefix='srch'):
+    """Следующая порция результатов поиска после (rank, page_id)"""
+    rank: float
+    page_id: int
+
+
+class BookmarksCallback(CallbackData, prefix='bms'):
+    """
+    Страница списка закладок: next - закладки после cursor,
+    prev - закладки перед cursor
+    """
+    direction: str
+    cursor: int
@@ -0,0 +1,67 @@
+import functools
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from aiogram.types import InlineKeyboardMarkup
+
+from config_data.config import settings
+from services.metrics import Gauge
+
+
+class KeyboardCache:
+    """
+    LRU-кэш готовых инлайн-клавиатур. Разметка aiogram неизменяема,
+    поэтому один объект можно отдавать в разные сообщения. Ключ - имя
+    клавиатуры и ее аргументы, для каждой записи помнится книга, чтобы
+    сбросить клавиатуры при перезагрузке книги
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._markups: OrderedDict[Hashable, tuple[int | None, InlineKeyboardMarkup]] = OrderedDict()
+
+    def get_or_build(self, key: Hashable, book_id: int | None,
+                     build: Callable[[], InlineKeyboardMarkup]) -> InlineKeyboardMarkup:
+        cached = self._markups.get(key)
+        if cached is not None:
+            self._markups.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        markup = build()
+        self._markups[key] = (book_id, markup)
+        if len(self._markups) > self.maxsize:
+            self._markups.popitem(last=False)
+        return markup
+
+    def invalidate_book(self, book_id: int):
+        """Сбрасывает клавиатуры книги и списки книг, в которых она есть"""
+        for key in [key for key, (owner, _) in self._markups.items() if owner in (book_id, None)]:
+            del self._markups[key]
+
+
+keyboard_cache = KeyboardCache(settings.KEYBOARD_CACHE_SIZE)
+
+keyboard_cache_hits = Gauge(
+    'keyboard_cache_hits', 'Keyboard cache hits since start', function=lambda: keyboard_cache.hits
+)
+keyboard_cache_misses = Gauge(
+    'keyboard_cache_misses', 'Keyboard cache misses since start', function=lambda: keyboard_cache.misses
+)
+
+
+def cached_keyboard(book_id_arg: bool = True):
+    """
+    Декоратор для функций-клавиатур с хешируемыми аргументами.
+    Если book_id_arg - первый аргумент функции считается id книги
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            book_id = args[0] if book_id_arg else None
+            key = (func.__name__, args, tuple(sorted(kwargs.items())))
+            return keyboard_cache.get_or_build(key, book_id, lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
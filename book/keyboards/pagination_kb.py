@@ -1,17 +1,43 @@
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from keyboards.callback_data import PageCallback, TableCallback
+from keyboards.keyboard_cache import cached_keyboard
 from messages.messages import LEXICON
 
 
-def create_pagination_keyboard(*buttons: str) -> InlineKeyboardMarkup:
+@cached_keyboard()
+def create_pagination_keyboard(book_id: int, page: int, total_pages: int) -> InlineKeyboardMarkup:
+    """
+    Клавиатура под страницей книги. page - номер страницы, начиная с 0
+    """
     kb_builder = InlineKeyboardBuilder()
-    kb_builder.row(*[InlineKeyboardButton(
-        text=LEXICON[button] if button in LEXICON else button,
-        callback_data=button) for button in buttons], width=3
+    if page > 0:
+        before = InlineKeyboardButton(
+            text=LEXICON['before'],
+            callback_data=PageCallback(action='before', book_id=book_id, page=page).pack())
+    else:
+        before = InlineKeyboardButton(text='...', callback_data='...')
+    if page < total_pages - 1:
+        after = InlineKeyboardButton(
+            text=LEXICON['after'],
+            callback_data=PageCallback(action='after', book_id=book_id, page=page).pack())
+    else:
+        after = InlineKeyboardButton(text='...', callback_data='...')
+
+    kb_builder.row(
+        before,
+        InlineKeyboardButton(
+            text=f'{page + 1} / {total_pages}',
+            callback_data=PageCallback(action='mark', book_id=book_id, page=page).pack()),
+        after,
+        InlineKeyboardButton(
+            text=LEXICON['bookmarks'],
+            callback_data='bookmarks'),
+        width=3
     )
     kb_builder.add(InlineKeyboardButton(
         text="Оглавление",
-        callback_data="nav_1"
+        callback_data=TableCallback(book_id=book_id, page=1).pack()
     ))
 
     return kb_builder.as_markup()
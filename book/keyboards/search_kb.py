@@ -0,0 +1,21 @@
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from keyboards.callback_data import PageCallback, SearchCallback
+from messages.messages import LEXICON
+
+
+def create_search_keyboard(hits, next_cursor: tuple[float, int] | None) -> InlineKeyboardMarkup:
+    """Кнопки перехода к найденным страницам и кнопка следующей порции результатов"""
+    kb_builder = InlineKeyboardBuilder()
+    for number, hit in enumerate(hits, start=1):
+        kb_builder.row(InlineKeyboardButton(
+            text=f'{number}. {hit.name[:40]}, стр. {hit.page_no + 1}',
+            callback_data=PageCallback(action='open', book_id=hit.book_id, page=hit.page_no).pack()
+        ))
+    if next_cursor is not None:
+        rank, page_id = next_cursor
+        kb_builder.row(InlineKeyboardButton(
+            text=LEXICON['search_more'],
+            callback_data=SearchCallback(rank=rank, page_id=page_id).pack()
+        ))
+    return kb_builder.as_markup()
@@ -1,25 +1,46 @@
 from aiogram.utils.keyboard import InlineKeyboardButton, InlineKeyboardBuilder
+from keyboards.callback_data import PageCallback, TableCallback
+from keyboards.keyboard_cache import cached_keyboard
 
 
-def create_table_keyboard(buttons, current_page=1, total_pages=1, counter=0):
-    kb_builder = InlineKeyboardBuilder()
-
-    for button in buttons:
-        kb_builder.add(InlineKeyboardButton(
-            text=str(counter),
-            callback_data=f"page_{current_page}_{button}"
-        ))
-        counter += 1
-
+def _add_navigation(kb_builder, book_id, current_page, total_pages):
     if current_page > 1:
         kb_builder.row(InlineKeyboardButton(
             text="Назад",
-            callback_data=f"nav_{current_page - 1}"
+            callback_data=TableCallback(book_id=book_id, page=current_page - 1).pack()
         ))
     if current_page < total_pages:
         kb_builder.add(InlineKeyboardButton(
             text="Вперед",
-            callback_data=f"nav_{current_page + 1}"
+            callback_data=TableCallback(book_id=book_id, page=current_page + 1).pack()
+        ))
+
+
+@cached_keyboard()
+def create_table_keyboard(book_id, pages, current_page=1, total_pages=1):
+    kb_builder = InlineKeyboardBuilder()
+
+    for page in pages:
+        kb_builder.add(InlineKeyboardButton(
+            text=str(page + 1),
+            callback_data=PageCallback(action='open', book_id=book_id, page=page).pack()
+        ))
+    kb_builder.adjust(8)
+    _add_navigation(kb_builder, book_id, current_page, total_pages)
+
+    return kb_builder.as_markup()
+
+
+@cached_keyboard()
+def create_toc_keyboard(book_id, entries, current_page=1, total_pages=1):
+    """Клавиатура оглавления: по кнопке на главу, entries - кортеж (заголовок, уровень, страница)"""
+    kb_builder = InlineKeyboardBuilder()
+
+    for title, level, page in entries:
+        kb_builder.row(InlineKeyboardButton(
+            text=f"{'· ' * (level - 1)}{title} - {page + 1}",
+            callback_data=PageCallback(action='open', book_id=book_id, page=page).pack()
         ))
+    _add_navigation(kb_builder, book_id, current_page, total_pages)
 
     return kb_builder.as_markup()
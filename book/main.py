@@ -6,8 +6,17 @@ from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 
 from config_data.config import settings
-from handlers import other_handlers, user_handlers
+from handlers import admin_handlers, other_handlers, user_handlers
 from keyboards.main_menu import set_main_menu
+from middlewares.instrumentation import ApiTimingMiddleware, HandlerNameMiddleware, UpdateTimingMiddleware
+from middlewares.outbound import OutboundScheduler
+from middlewares.throttling import CallbackThrottleMiddleware
+from services.check_user_in_db import load_known_users
+from services.extractors import shutdown_process_pool
+from services.metrics import start_metrics_server
+from services.progress import progress_tracker
+from services.webhook import run_webhook
+from services.write_book_in_db import book_writer
 
 
 logger = logging.getLogger(__name__)
@@ -24,15 +33,48 @@ async def main():
         token=settings.TOKEN,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
+    # Время запросов к Telegram считается вместе с ожиданием лимитов
+    bot.session.middleware(ApiTimingMiddleware())
+    bot.session.middleware(OutboundScheduler(
+        global_rate=settings.TELEGRAM_GLOBAL_RATE,
+        chat_rate=settings.TELEGRAM_CHAT_RATE,
+        chat_burst=settings.TELEGRAM_CHAT_BURST,
+        max_retries=settings.TELEGRAM_MAX_RETRIES,
+    ))
     dp = Dispatcher()
+    dp.update.outer_middleware(UpdateTimingMiddleware(settings.SLOW_UPDATE_THRESHOLD))
+    dp.message.middleware(HandlerNameMiddleware())
+    dp.callback_query.middleware(HandlerNameMiddleware())
+    dp.callback_query.outer_middleware(CallbackThrottleMiddleware(settings.CALLBACK_DEBOUNCE_WINDOW))
 
     await set_main_menu(bot)
 
+    dp.include_router(admin_handlers.router)
     dp.include_router(user_handlers.router)
     dp.include_router(other_handlers.router)
 
-    await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
+    # Книги загружаются в фоне, чтобы бот сразу начал отвечать пользователям
+    ingest_task = asyncio.create_task(book_writer.run())
+
+    await load_known_users()
+    progress_tracker.start()
+
+    metrics_runner = None
+    if settings.METRICS_PORT:
+        metrics_runner = await start_metrics_server(settings.METRICS_HOST, settings.METRICS_PORT)
+
+    try:
+        if settings.WEBHOOK_URL:
+            await run_webhook(dp, bot)
+        else:
+            await bot.delete_webhook(drop_pending_updates=True)
+            await dp.start_polling(bot)
+    finally:
+        ingest_task.cancel()
+        shutdown_process_pool()
+        await progress_tracker.stop()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -6,7 +6,8 @@ LEXICON: dict[str, str] = {
               '"\n\nЧтобы посмотреть список доступных '
               'команд - набери /help',
     '/help': '<b>Это бот-читалка</b>\n\nДоступные команды:\n/users_books - список книг, которые вы начали читать'
-             '\n/bookmarks - посмотреть список закладок\n/books_list - Список доступных книг \n/help - '
+             '\n/bookmarks - посмотреть список закладок\n/books_list - Список доступных книг'
+             '\n/search слова - поиск по всем книгам\n/search_book слова - поиск в текущей книге\n/help - '
              'справка по работе бота\n\nЧтобы сохранить закладку - '
              'нажмите на кнопку с номером страницы\n'
              '\n<b>Приятного чтения!</b>',
@@ -22,7 +23,20 @@ LEXICON: dict[str, str] = {
     'users_books': 'Ваши книги, которые вы читали...',
     'bookmarks': 'Закладки',
     'table': 'Оглавление',
-    'echo': 'Введена некорректная команда, /help для информации...'
+    'echo': 'Введена некорректная команда, /help для информации...',
+    'search_usage': 'Напишите, что искать, например: /search реляционная модель',
+    'search_no_book': 'Сначала откройте книгу, в которой нужно искать',
+    'search_nothing': 'Ничего не найдено',
+    'search_results': 'Результаты поиска:',
+    'search_more': 'Еще >>>',
+    'busy': 'Бот сейчас перегружен, попробуйте еще раз через минуту',
+    'reindex_started': 'Проверяю папку с книгами...',
+    'reindex_running': 'Загрузка книг уже идет, показываю ее прогресс',
+    'reindex_progress': 'Загрузка книг: {done} из {total} файлов, ошибок: {failed}\n'
+                        'Страниц: {pages} ({speed:.0f} стр/с)',
+    'reindex_done': 'Загрузка книг завершена за {elapsed:.0f} с: {done} из {total} файлов, '
+                    'ошибок: {failed}\nСтраниц: {pages} ({speed:.0f} стр/с)',
+    'reindex_errors': '\nНе загрузились: {files}',
 }
 
 LEXICON_COMMANDS: dict[str, str] = {
@@ -30,5 +44,6 @@ LEXICON_COMMANDS: dict[str, str] = {
     '/books_list': 'Список доступных книг',
     '/users_books': 'Мои книги',
     '/bookmarks': 'Мои закладки',
+    '/search': 'Поиск по книгам',
 
 }
@@ -0,0 +1,142 @@
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject
+from sqlalchemy import event
+
+from database.database import engine
+from services.metrics import Counter, Histogram
+
+
+logger = logging.getLogger(__name__)
+
+MAX_LOGGED_QUERIES = 50
+MAX_STATEMENT_LENGTH = 200
+
+handler_duration = Histogram('handler_duration_seconds', 'Wall time of update handling', ('handler',))
+handler_db_time = Histogram('handler_db_seconds', 'Time spent in DB queries per update', ('handler',))
+handler_db_queries = Histogram(
+    'handler_db_queries', 'Number of DB queries per update', ('handler',),
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100),
+)
+handler_api_time = Histogram('handler_api_seconds', 'Time spent in Telegram API calls per update', ('handler',))
+slow_updates = Counter('slow_updates_total', 'Updates handled slower than the threshold', ('handler',))
+
+
+class UpdateStats:
+    """Счетчики времени одного апдейта: обработчик, запросы к БД и к Telegram"""
+
+    __slots__ = ('handler', 'db_time', 'query_count', 'queries', 'api_time', 'api_calls')
+
+    def __init__(self):
+        self.handler = 'unhandled'
+        self.db_time = 0.0
+        self.query_count = 0
+        self.queries: list[tuple[str, float]] = []
+        self.api_time = 0.0
+        self.api_calls = 0
+
+
+current_stats: ContextVar[UpdateStats | None] = ContextVar('current_stats', default=None)
+
+
+@event.listens_for(engine.sync_engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Время начала хранится в контексте запроса: он живет один запрос,
+    # и при ошибке запроса на соединении ничего не остается
+    context._query_start_time = time.perf_counter()
+
+
+@event.listens_for(engine.sync_engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_start_time
+    stats = current_stats.get()
+    if stats is None:
+        return
+    stats.db_time += elapsed
+    stats.query_count += 1
+    if len(stats.queries) < MAX_LOGGED_QUERIES:
+        stats.queries.append((' '.join(statement.split())[:MAX_STATEMENT_LENGTH], elapsed))
+
+
+class UpdateTimingMiddleware(BaseMiddleware):
+    """
+    Внешний middleware апдейтов: замеряет время обработки, время и число
+    запросов к БД и время запросов к Telegram. Медленные апдейты
+    пишутся в лог вместе со списком запросов
+    """
+
+    def __init__(self, slow_threshold: float):
+        self.slow_threshold = slow_threshold
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        stats = UpdateStats()
+        token = current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_stats.reset(token)
+            self._record(stats, elapsed)
+
+    def _record(self, stats: UpdateStats, elapsed: float):
+        handler_duration.observe(elapsed, handler=stats.handler)
+        handler_db_time.observe(stats.db_time, handler=stats.handler)
+        handler_db_queries.observe(stats.query_count, handler=stats.handler)
+        handler_api_time.observe(stats.api_time, handler=stats.handler)
+        if elapsed < self.slow_threshold:
+            return
+        slow_updates.inc(handler=stats.handler)
+        queries = '\n'.join(f'  {duration * 1000:.1f} ms: {statement}' for statement, duration in stats.queries)
+        logger.warning(
+            'Slow update in %s: %.3f s total, %.3f s in %d DB queries, %.3f s in %d API calls\n%s',
+            stats.handler, elapsed, stats.db_time, stats.query_count, stats.api_time, stats.api_calls, queries,
+        )
+
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """Внутренний middleware: запоминает имя хэндлера, выбранного для апдейта"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        stats = current_stats.get()
+        handler_object = data.get('handler')
+        if stats is not None and handler_object is not None:
+            stats.handler = handler_object.callback.__name__
+        return await handler(event, data)
+
+
+class ApiTimingMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: добавляет время запросов к Telegram к счетчикам апдейта"""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        stats = current_stats.get()
+        if stats is None:
+            return await make_request(bot, method)
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            stats.api_time += time.perf_counter() - start
+            stats.api_calls += 1
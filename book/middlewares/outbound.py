@@ -0,0 +1,149 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import AnswerCallbackQuery, EditMessageReplyMarkup, EditMessageText, Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from services.metrics import Counter, Gauge, Histogram
+
+
+logger = logging.getLogger(__name__)
+
+# Чем меньше число, тем раньше запрос уходит в Telegram
+PRIORITIES = {
+    AnswerCallbackQuery: 0,
+    EditMessageText: 1,
+    EditMessageReplyMarkup: 1,
+}
+DEFAULT_PRIORITY = 2
+
+queue_depth = Gauge('telegram_outbound_queue_depth', 'Requests waiting for the global rate limit')
+queue_wait = Histogram(
+    'telegram_outbound_wait_seconds', 'Time a request waited for rate limits before sending', ('method',)
+)
+retries = Counter('telegram_outbound_retries_total', 'Requests retried after TelegramRetryAfter', ('method',))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Сколько секунд ждать до появления свободного токена"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def is_full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+    async def acquire(self):
+        while (delay := self.delay()) > 0:
+            await asyncio.sleep(delay)
+        self.take()
+
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """
+    Middleware сессии бота, ограничивающий исходящие запросы к Telegram:
+    общий лимит на бота и отдельный лимит на каждый чат. Запросы, ждущие
+    общего лимита, обслуживаются по приоритету - ответы на callback раньше
+    отправки сообщений. При TelegramRetryAfter запрос повторяется с паузой
+    """
+
+    max_chat_buckets = 10_000
+
+    def __init__(self, global_rate: float, chat_rate: float, chat_burst: int, max_retries: int):
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._chats: dict[int | str, TokenBucket] = {}
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._pump_task: asyncio.Task | None = None
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        method_name = type(method).__name__
+        priority = PRIORITIES.get(type(method), DEFAULT_PRIORITY)
+        chat_id = getattr(method, 'chat_id', None)
+
+        for attempt in itertools.count():
+            start = time.monotonic()
+            if chat_id is not None:
+                await self._chat_bucket(chat_id).acquire()
+            await self._acquire_global(priority)
+            queue_wait.observe(time.monotonic() - start, method=method_name)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as error:
+                if attempt >= self.max_retries:
+                    raise
+                retries.inc(method=method_name)
+                delay = error.retry_after + min(2 ** attempt, 30)
+                logger.warning('Flood control on %s, retrying in %s s', method_name, delay)
+                await asyncio.sleep(delay)
+
+    def _chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.max_chat_buckets:
+                # Полные корзины ничем не отличаются от новых - их можно забыть
+                self._chats = {key: value for key, value in self._chats.items() if not value.is_full()}
+            bucket = self._chats[chat_id] = TokenBucket(self._chat_rate, self._chat_burst)
+        return bucket
+
+    async def _acquire_global(self, priority: int):
+        if not self._waiters and self._global.delay() == 0:
+            self._global.take()
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        queue_depth.set(len(self._waiters))
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        self._wakeup.set()
+        await future
+
+    async def _pump(self):
+        while True:
+            if not self._waiters:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            delay = self._global.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            queue_depth.set(len(self._waiters))
+            if future.cancelled():
+                continue
+            self._global.take()
+            future.set_result(None)
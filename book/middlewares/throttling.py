@@ -0,0 +1,94 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery
+
+from services.metrics import Counter, Histogram
+
+
+callbacks_dropped = Counter(
+    'callbacks_dropped_total', 'Repeated callbacks dropped within the debounce window'
+)
+callbacks_coalesced = Counter(
+    'callbacks_coalesced_total', 'Callbacks dropped because the same callback was still being handled'
+)
+user_lock_wait = Histogram('callback_user_lock_wait_seconds', 'Time a callback waited for the previous one of its user')
+
+
+class CallbackThrottleMiddleware(BaseMiddleware):
+    """
+    Внешний middleware для callback-запросов. Повторные нажатия той же
+    кнопки тем же пользователем в пределах окна, а также нажатия, пока
+    предыдущее такое же еще обрабатывается, отбрасываются с пустым ответом.
+    Остальные callback одного пользователя обрабатываются по очереди
+    """
+
+    max_tracked = 10_000
+
+    def __init__(self, window: float):
+        self.window = window
+        self._accepted: dict[tuple[int, str], float] = {}
+        self._in_flight: set[tuple[int, str]] = set()
+        self._locks: dict[int, asyncio.Lock] = {}
+        self._lock_users: dict[int, int] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[CallbackQuery, dict[str, Any]], Awaitable[Any]],
+        event: CallbackQuery,
+        data: dict[str, Any],
+    ) -> Any:
+        key = (event.from_user.id, event.data)
+        now = time.monotonic()
+        if key in self._in_flight:
+            callbacks_coalesced.inc()
+            await self._answer(event)
+            return None
+        if now - self._accepted.get(key, float('-inf')) < self.window:
+            callbacks_dropped.inc()
+            await self._answer(event)
+            return None
+
+        self._remember(key, now)
+        self._in_flight.add(key)
+        try:
+            async with self._user_lock(event.from_user.id):
+                return await handler(event, data)
+        finally:
+            self._in_flight.discard(key)
+            # Окно отсчитывается и от конца обработки: медленный ответ не открывает дорогу повтору
+            self._remember(key, time.monotonic())
+
+    @staticmethod
+    async def _answer(event: CallbackQuery):
+        try:
+            await event.answer()
+        except TelegramBadRequest:
+            # Запрос уже устарел - отвечать на него не нужно
+            pass
+
+    def _remember(self, key: tuple[int, str], now: float):
+        if len(self._accepted) >= self.max_tracked:
+            self._accepted = {
+                seen_key: seen for seen_key, seen in self._accepted.items() if now - seen < self.window
+            }
+        self._accepted[key] = now
+
+    @asynccontextmanager
+    async def _user_lock(self, user_id: int):
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        self._lock_users[user_id] = self._lock_users.get(user_id, 0) + 1
+        start = time.monotonic()
+        try:
+            async with lock:
+                user_lock_wait.observe(time.monotonic() - start)
+                yield
+        finally:
+            self._lock_users[user_id] -= 1
+            if not self._lock_users[user_id]:
+                del self._lock_users[user_id]
+                del self._locks[user_id]
@@ -1,13 +1,51 @@
-from sqlalchemy import select
+from aiogram.types import User as TelegramUser
+from sqlalchemy import literal_column, select
+from sqlalchemy.dialects.postgresql import insert
 
 from database.database import async_session
 from database.models import User
 
 
-async def check_user_in_db(message):
+known_users: set[int] = set()
+
+
+async def load_known_users():
+    """Загружает id зарегистрированных пользователей в память при старте бота"""
+    async with async_session() as session:
+        result = await session.execute(select(User.user_id))
+        known_users.update(result.scalars().all())
+
+
+def check_user_in_db(user_id: int) -> bool:
     """Функция, которая поверяет есть ли пользователь в БД"""
+    return user_id in known_users
+
+
+async def register_user(user: TelegramUser) -> bool:
+    """
+    Регистрирует пользователя одним запросом INSERT ... ON CONFLICT.
+    Возвращает True, если пользователь добавлен впервые
+    """
+    if user.id in known_users:
+        return False
+
+    query = insert(User).values(
+        user_id=user.id, username=user.username,
+        first_name=user.first_name, last_name=user.last_name,
+    )
+    query = query.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={
+            'username': query.excluded.username,
+            'first_name': query.excluded.first_name,
+            'last_name': query.excluded.last_name,
+        },
+    ).returning(literal_column('xmax = 0'))
+
     async with async_session() as session:
-        query = select(User).where(User.user_id == message.from_user.id)
         result = await session.execute(query)
-        user = result.scalars().all()
-        return len(user) > 0
+        created = result.scalar_one()
+        await session.commit()
+
+    known_users.add(user.id)
+    return created
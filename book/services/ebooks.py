@@ -0,0 +1,286 @@
+import asyncio
+import posixpath
+import zipfile
+from html.parser import HTMLParser
+from typing import AsyncIterator, Iterator
+from urllib.parse import unquote
+from xml.etree import ElementTree
+
+from services.extractors import get_process_pool, iter_in_process, iter_in_process_pool
+from services.toc import TocBuilder
+
+
+# Текст отдается частями примерно такого размера (в символах)
+TEXT_CHUNK_SIZE = 64 * 1024
+
+FB2_TEXT_BLOCKS = {'p', 'v', 'subtitle', 'text-author'}
+FB2_SKIPPED = {'description', 'binary'}
+
+XHTML_BLOCKS = {'p', 'div', 'li', 'tr', 'blockquote', 'section', 'article', 'pre', 'dt', 'dd', 'table'}
+XHTML_HEADINGS = {'h1': 1, 'h2': 2, 'h3': 3}
+XHTML_SKIPPED = {'head', 'script', 'style', 'svg'}
+
+
+def _local_name(tag: str) -> str:
+    return tag.rpartition('}')[2]
+
+
+def _element_text(element: ElementTree.Element) -> str:
+    return ' '.join(''.join(element.itertext()).split())
+
+
+def _fb2_chunks(fb2_path: str) -> Iterator[tuple[str, list[tuple[int, int, str]]]]:
+    """
+    Выполняется в отдельном процессе: разбирает FB2 через iterparse и отдает текст
+    частями вместе с заголовками разделов (смещение, уровень, заголовок).
+    Разобранные элементы сразу очищаются и удаляются из родителя,
+    поэтому дерево всего документа в памяти не строится
+    """
+    parts: list[str] = []
+    headings: list[tuple[int, int, str]] = []
+    buffered = 0
+    emitted = 0
+    stack: list[ElementTree.Element] = []
+    section_depth = 0
+    title_depth = 0
+    in_body = False
+    main_body = False
+
+    for event, element in ElementTree.iterparse(fb2_path, events=('start', 'end')):
+        tag = _local_name(element.tag)
+        if event == 'start':
+            stack.append(element)
+            if tag == 'body':
+                in_body = True
+                # Второй и следующие body - обычно примечания, в оглавление они не идут
+                main_body = element.get('name') is None
+            elif tag == 'section':
+                section_depth += 1
+            elif tag == 'title':
+                title_depth += 1
+            continue
+
+        stack.pop()
+        if tag == 'title':
+            title_depth -= 1
+        if title_depth > 0:
+            # Строки заголовка собираются целиком в конце title
+            continue
+
+        text = ''
+        if tag == 'title' and in_body:
+            lines = [_element_text(child) for child in element if _local_name(child.tag) == 'p']
+            lines = [line for line in lines if line] or [_element_text(element)]
+            title = ' '.join(lines)
+            if title:
+                if main_body and section_depth > 0:
+                    headings.append((emitted + buffered, section_depth, title))
+                text = '\n'.join(lines) + '\n\n'
+        elif tag in FB2_TEXT_BLOCKS and in_body:
+            text = ''.join(element.itertext()).strip() + '\n'
+        elif tag in ('empty-line', 'stanza', 'section'):
+            text = '\n'
+        if tag == 'section':
+            section_depth -= 1
+        elif tag == 'body':
+            in_body = False
+
+        if text:
+            parts.append(text)
+            buffered += len(text)
+        if tag in FB2_TEXT_BLOCKS or tag in FB2_SKIPPED or tag in ('title', 'section', 'body', 'empty-line'):
+            element.clear()
+            if stack and len(stack[-1]) and stack[-1][-1] is element:
+                del stack[-1][-1]
+
+        if buffered >= TEXT_CHUNK_SIZE:
+            yield ''.join(parts), headings
+            emitted += buffered
+            parts, headings, buffered = [], [], 0
+
+    if parts:
+        yield ''.join(parts), headings
+
+
+async def iter_fb2_text(fb2_path: str, toc: TocBuilder) -> AsyncIterator[str]:
+    """Текст FB2 частями, заголовки разделов добавляются в toc"""
+    async for chunk, headings in iter_in_process(_fb2_chunks, fb2_path):
+        for offset, level, title in headings:
+            toc.add(offset, level, title)
+        yield chunk
+
+
+class _XhtmlText(HTMLParser):
+    """Собирает текст главы EPUB и ее заголовки h1-h3"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: list[str] = []
+        self.headings: list[tuple[int, str]] = []
+        self._skip_depth = 0
+        self._heading: tuple[int, list[str]] | None = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in XHTML_SKIPPED:
+            self._skip_depth += 1
+        elif tag == 'br':
+            self.parts.append('\n')
+        elif tag in XHTML_HEADINGS:
+            self.parts.append('\n')
+            self._heading = (XHTML_HEADINGS[tag], [])
+        elif tag in XHTML_BLOCKS or tag in ('h4', 'h5', 'h6'):
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in XHTML_SKIPPED:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in XHTML_HEADINGS and self._heading is not None:
+            level, words = self._heading
+            title = ' '.join(' '.join(words).split())
+            if title:
+                self.headings.append((level, title))
+            self._heading = None
+            self.parts.append('\n\n')
+        elif tag in XHTML_BLOCKS or tag in ('h4', 'h5', 'h6'):
+            self.parts.append('\n')
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        # Переводы строк в разметке - не переводы строк в тексте
+        data = ' '.join(data.split('\n'))
+        if self._heading is not None:
+            self._heading[1].append(data)
+        self.parts.append(data)
+
+    def text(self) -> str:
+        lines = (' '.join(line.split()) for line in ''.join(self.parts).split('\n'))
+        return '\n'.join(line for line in lines if line) + '\n\n'
+
+
+def _extract_epub_item(epub_path: str, item_path: str) -> tuple[str, str, list[tuple[int, int, str]]]:
+    """
+    Выполняется в отдельном процессе: текст одного файла книги из spine
+    и его заголовки со смещением внутри текста файла
+    """
+    with zipfile.ZipFile(epub_path) as epub:
+        data = epub.read(item_path)
+    parser = _XhtmlText()
+    parser.feed(data.decode('utf-8', errors='replace'))
+    parser.close()
+    text = parser.text()
+    headings = []
+    position = 0
+    for level, title in parser.headings:
+        found = text.find(title, position)
+        if found != -1:
+            headings.append((found, level, title))
+            position = found + len(title)
+    return item_path, text, headings
+
+
+def _resolve_href(base_path: str, href: str) -> str:
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base_path), unquote(href.split('#')[0])))
+
+
+def _ncx_entries(epub: zipfile.ZipFile, ncx_path: str) -> list[tuple[int, str, str]]:
+    entries = []
+
+    def walk(parent: ElementTree.Element, level: int):
+        for nav_point in parent:
+            if _local_name(nav_point.tag) != 'navPoint':
+                continue
+            label = next((el for el in nav_point.iter() if _local_name(el.tag) == 'text'), None)
+            content = next((el for el in nav_point if _local_name(el.tag) == 'content'), None)
+            if label is not None and content is not None and content.get('src'):
+                entries.append((level, _element_text(label), _resolve_href(ncx_path, content.get('src'))))
+            walk(nav_point, level + 1)
+
+    root = ElementTree.fromstring(epub.read(ncx_path))
+    nav_map = next((el for el in root.iter() if _local_name(el.tag) == 'navMap'), None)
+    if nav_map is not None:
+        walk(nav_map, 1)
+    return entries
+
+
+def _nav_entries(epub: zipfile.ZipFile, nav_path: str) -> list[tuple[int, str, str]]:
+    entries = []
+
+    def walk(ordered_list: ElementTree.Element, level: int):
+        for item in ordered_list:
+            if _local_name(item.tag) != 'li':
+                continue
+            for child in item:
+                name = _local_name(child.tag)
+                if name == 'a' and child.get('href'):
+                    entries.append((level, _element_text(child), _resolve_href(nav_path, child.get('href'))))
+                elif name == 'ol':
+                    walk(child, level + 1)
+
+    root = ElementTree.fromstring(epub.read(nav_path))
+    for nav in root.iter():
+        if _local_name(nav.tag) == 'nav' and 'toc' in nav.get('{http://www.idpf.org/2007/ops}type', 'toc'):
+            for ordered_list in nav:
+                if _local_name(ordered_list.tag) == 'ol':
+                    walk(ordered_list, 1)
+            break
+    return entries
+
+
+def _epub_layout(epub_path: str) -> tuple[list[str], list[tuple[int, str, str]]]:
+    """
+    Выполняется в отдельном процессе: порядок файлов книги (spine)
+    и оглавление из nav или toc.ncx - (уровень, заголовок, файл)
+    """
+    with zipfile.ZipFile(epub_path) as epub:
+        container = ElementTree.fromstring(epub.read('META-INF/container.xml'))
+        opf_path = next(el.get('full-path') for el in container.iter() if _local_name(el.tag) == 'rootfile')
+        package = ElementTree.fromstring(epub.read(opf_path))
+        manifest = {item.get('id'): item for item in package.iter() if _local_name(item.tag) == 'item'}
+        spine = next(el for el in package.iter() if _local_name(el.tag) == 'spine')
+        items = [
+            _resolve_href(opf_path, manifest[ref.get('idref')].get('href'))
+            for ref in spine
+            if _local_name(ref.tag) == 'itemref' and ref.get('idref') in manifest
+        ]
+
+        nav = next((item for item in manifest.values() if 'nav' in (item.get('properties') or '').split()), None)
+        ncx = manifest.get(spine.get('toc'))
+        try:
+            if nav is not None:
+                entries = _nav_entries(epub, _resolve_href(opf_path, nav.get('href')))
+            elif ncx is not None:
+                entries = _ncx_entries(epub, _resolve_href(opf_path, ncx.get('href')))
+            else:
+                entries = []
+        except (KeyError, ElementTree.ParseError):
+            # Битое оглавление - заголовки возьмутся из h1-h3 глав
+            entries = []
+    return items, entries
+
+
+async def iter_epub_text(epub_path: str, toc: TocBuilder) -> AsyncIterator[str]:
+    """
+    Текст EPUB по файлам из spine. Файлы разбираются параллельно в пуле
+    процессов, текст отдается по порядку. Оглавление берется из nav/toc.ncx,
+    а если его нет - из заголовков h1-h3
+    """
+    loop = asyncio.get_running_loop()
+    items, entries = await loop.run_in_executor(get_process_pool(), _epub_layout, epub_path)
+
+    item_offsets: dict[str, int] = {}
+    offset = 0
+    calls = ((_extract_epub_item, epub_path, item_path) for item_path in items)
+    async for item_path, text, headings in iter_in_process_pool(calls):
+        item_offsets.setdefault(item_path, offset)
+        if not entries:
+            for heading_offset, level, title in headings:
+                toc.add(offset + heading_offset, level, title)
+        if text.strip():
+            yield text
+            offset += len(text)
+
+    for level, title, item_path in entries:
+        if item_path in item_offsets:
+            toc.add(item_offsets[item_path], level, title)
+
@@ -0,0 +1,207 @@
+import asyncio
+import codecs
+import io
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing.managers import SyncManager
+from queue import Empty, Full
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator
+
+import aiofiles
+import fitz
+from charset_normalizer import from_bytes
+
+from config_data.config import settings
+
+
+PDF_PAGES_PER_TASK = 25
+TXT_CHUNK_SIZE = 1024 * 1024
+ENCODING_SAMPLE_SIZE = 64 * 1024
+# Как часто ожидание очереди между процессами проверяет, не пора ли остановиться
+QUEUE_POLL_INTERVAL = 0.5
+
+_process_pool: ProcessPoolExecutor | None = None
+# Процесс-менеджер для очередей, через которые пул процессов отдает текст частями
+_manager: SyncManager | None = None
+
+
+def _pool_workers() -> int:
+    return settings.INGEST_WORKERS or os.cpu_count() or 1
+
+
+def _mp_context():
+    # В процессе бота уже работают потоки (asyncio.to_thread, драйвер БД), а fork
+    # многопоточного процесса может унести в дочерний чужую захваченную блокировку
+    return multiprocessing.get_context('forkserver')
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=_pool_workers(), mp_context=_mp_context())
+    return _process_pool
+
+
+def _get_manager() -> SyncManager:
+    global _manager
+    if _manager is None:
+        _manager = _mp_context().Manager()
+    return _manager
+
+
+def shutdown_process_pool():
+    global _process_pool, _manager
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+    if _manager is not None:
+        _manager.shutdown()
+        _manager = None
+
+
+def _pdf_page_count(pdf_path: str) -> int:
+    with fitz.open(pdf_path) as pdf_reader:
+        return pdf_reader.page_count
+
+
+def _pdf_outline(pdf_path: str) -> list[tuple[int, str, int]]:
+    """Оглавление PDF: (уровень, заголовок, номер страницы PDF с 1)"""
+    with fitz.open(pdf_path) as pdf_reader:
+        return [(level, title, page) for level, title, page in pdf_reader.get_toc(simple=True)]
+
+
+def _extract_pdf_pages(pdf_path: str, start: int, stop: int) -> list[str]:
+    """Выполняется в отдельном процессе: достает текст страниц [start, stop)"""
+    with fitz.open(pdf_path) as pdf_reader:
+        return [pdf_reader[page_num].get_text() for page_num in range(start, stop)]
+
+
+async def get_pdf_outline(pdf_path: str) -> list[tuple[int, str, int]]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), _pdf_outline, pdf_path)
+
+
+async def iter_in_process_pool(calls: Iterable[tuple]) -> AsyncIterator[Any]:
+    """
+    Выполняет вызовы (функция, *аргументы) в пуле процессов параллельно
+    и отдает результаты в порядке вызовов. Число одновременно выполняемых
+    вызовов ограничено, чтобы не держать в памяти всю книгу,
+    если запись в БД отстает
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    pending = deque(calls)
+    max_in_flight = _pool_workers() * 2
+    in_flight = deque()
+    try:
+        while pending or in_flight:
+            while pending and len(in_flight) < max_in_flight:
+                function, *args = pending.popleft()
+                in_flight.append(loop.run_in_executor(pool, function, *args))
+            yield await in_flight.popleft()
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+def _produce_into_queue(queue, stopped, function: Callable[..., Iterator[Any]], args: tuple):
+    """Выполняется в отдельном процессе: кладет элементы генератора в очередь"""
+    def put(kind, item=None) -> bool:
+        while not stopped.is_set():
+            try:
+                queue.put((kind, item), timeout=QUEUE_POLL_INTERVAL)
+                return True
+            except Full:
+                continue
+        return False
+
+    try:
+        for item in function(*args):
+            if not put('item', item):
+                return
+    except BaseException:
+        # Само исключение вернет future пула процессов
+        put('error')
+        raise
+    put('done')
+
+
+async def iter_in_process(function: Callable[..., Iterator[Any]], *args, maxsize: int = 8) -> AsyncIterator[Any]:
+    """
+    Выполняет синхронный генератор в пуле процессов и отдает его элементы.
+    Очередь между процессом и циклом событий ограничена maxsize: если
+    потребитель отстает, процесс ждет. Функция и элементы должны сериализоваться pickle
+    """
+    loop = asyncio.get_running_loop()
+    manager = _get_manager()
+    queue = manager.Queue(maxsize)
+    stopped = manager.Event()
+    future = loop.run_in_executor(get_process_pool(), _produce_into_queue, queue, stopped, function, args)
+    try:
+        while True:
+            try:
+                kind, item = await loop.run_in_executor(None, partial(queue.get, timeout=QUEUE_POLL_INTERVAL))
+            except Empty:
+                if future.done():
+                    # Процесс пула упал, не успев ничего положить в очередь
+                    future.result()
+                continue
+            if kind != 'item':
+                # После 'error' future пула поднимет исключение из процесса
+                await future
+                return
+            yield item
+    finally:
+        # Процесс увидит stopped при следующей попытке положить элемент и завершится
+        stopped.set()
+        future.cancel()
+
+
+async def iter_pdf_text(pdf_path: str, pages_per_task: int = PDF_PAGES_PER_TASK) -> AsyncIterator[str]:
+    """
+    Достает текст PDF в пуле процессов. Диапазоны страниц обрабатываются
+    параллельно, а текст отдается постранично по порядку
+    """
+    loop = asyncio.get_running_loop()
+    page_count = await loop.run_in_executor(get_process_pool(), _pdf_page_count, pdf_path)
+    calls = (
+        (_extract_pdf_pages, pdf_path, start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    )
+    async for pages in iter_in_process_pool(calls):
+        for page_text in pages:
+            yield page_text
+
+
+def _detect_encoding(sample: bytes) -> str:
+    """Кодировка текста по его началу, utf-8 - если определить не удалось"""
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    best = from_bytes(sample).best()
+    # Начало файла только из ASCII ничего не говорит о кодировке остального текста
+    if best is None or best.encoding == 'ascii':
+        return 'utf-8'
+    return best.encoding
+
+
+async def iter_txt_text(file_path: str, chunk_size: int = TXT_CHUNK_SIZE) -> AsyncIterator[str]:
+    """
+    Читает текстовый файл частями по chunk_size байт. Кодировка определяется
+    по началу файла, а многобайтовые символы и переводы строк \r\n
+    на границе частей собираются инкрементальным декодером
+    """
+    async with aiofiles.open(file_path, 'rb') as file:
+        data = await file.read(max(chunk_size, ENCODING_SAMPLE_SIZE))
+        encoding = await asyncio.to_thread(_detect_encoding, data[:ENCODING_SAMPLE_SIZE])
+        decoder = io.IncrementalNewlineDecoder(
+            codecs.getincrementaldecoder(encoding)(errors='replace'), translate=True
+        )
+        while data:
+            if text := decoder.decode(data):
+                yield text
+            data = await file.read(chunk_size)
+        if text := decoder.decode(b'', final=True):
+            yield text
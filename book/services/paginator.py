@@ -0,0 +1,51 @@
+from typing import Iterator
+
+# Telegram ограничивает сообщение 4096 символами, оставляем запас
+MAX_PAGE_SIZE = 4000
+SENTENCE_END_SIGNS = '.!?…'
+SOFT_END_SIGNS = ',;:\n'
+
+
+class PageSplitter:
+    """
+    Потоковый разбиватель текста на страницы.
+    Текст можно подавать частями через feed(), готовые страницы отдаются
+    сразу, а неполная последняя страница остается в буфере до следующей
+    части или до вызова close(). Страницы режутся по концу предложения,
+    если он есть во второй половине страницы. В page_starts копятся
+    смещения начала каждой отданной страницы в исходном тексте
+    """
+
+    def __init__(self, page_size: int = MAX_PAGE_SIZE):
+        self.page_size = page_size
+        self.page_starts: list[int] = []
+        self._buffer = ''
+        self._buffer_offset = 0
+
+    def feed(self, chunk: str) -> Iterator[str]:
+        self._buffer += chunk
+        start = 0
+        while len(self._buffer) - start > self.page_size:
+            end = self._find_page_end(self._buffer, start, start + self.page_size)
+            page = self._buffer[start:end].strip()
+            if page:
+                self.page_starts.append(self._buffer_offset + start)
+                yield page
+            start = end
+        self._buffer = self._buffer[start:]
+        self._buffer_offset += start
+
+    def close(self) -> Iterator[str]:
+        page = self._buffer.strip()
+        self._buffer = ''
+        if page:
+            self.page_starts.append(self._buffer_offset)
+            yield page
+
+    def _find_page_end(self, text: str, start: int, end: int) -> int:
+        lower_bound = start + self.page_size // 2
+        for signs in (SENTENCE_END_SIGNS, SOFT_END_SIGNS, ' '):
+            position = max(text.rfind(sign, lower_bound, end) for sign in signs)
+            if position != -1:
+                return position + 1
+        return end
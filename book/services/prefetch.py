@@ -0,0 +1,56 @@
+import asyncio
+import contextvars
+import logging
+
+from config_data.config import settings
+from database.cache import page_cache
+from database.pages import prefetch_pages
+
+
+logger = logging.getLogger(__name__)
+
+
+class PagePrefetcher:
+    """
+    Фоновая подгрузка в кэш следующих страниц книги, которую читает
+    пользователь. На каждого пользователя - не больше одной задачи,
+    общее число одновременных запросов к БД ограничено семафором
+    """
+
+    def __init__(self, pages_ahead: int, concurrency: int):
+        self.pages_ahead = pages_ahead
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks: dict[int, asyncio.Task] = {}
+
+    def schedule(self, user_id: int, book_id: int, page_no: int, total_pages: int):
+        self.cancel(user_id)
+        stop = min(page_no + 1 + self.pages_ahead, total_pages)
+        missing = [n for n in range(page_no + 1, stop) if (book_id, n) not in page_cache]
+        if not missing:
+            return
+        # Пустой контекст: запросы подгрузки не засчитываются апдейту, который ее запустил
+        task = asyncio.create_task(
+            self._prefetch(book_id, missing[0], missing[-1] + 1), context=contextvars.Context()
+        )
+        self._tasks[user_id] = task
+        task.add_done_callback(lambda done: self._forget(user_id, done))
+
+    def cancel(self, user_id: int):
+        """Пользователь ушел из книги - подгружать для него больше нечего"""
+        task = self._tasks.pop(user_id, None)
+        if task is not None:
+            task.cancel()
+
+    def _forget(self, user_id: int, task: asyncio.Task):
+        if self._tasks.get(user_id) is task:
+            del self._tasks[user_id]
+
+    async def _prefetch(self, book_id: int, start: int, stop: int):
+        async with self._semaphore:
+            try:
+                await prefetch_pages(book_id, start, stop)
+            except Exception:
+                logger.warning('Prefetch of book %s pages %s-%s failed', book_id, start, stop, exc_info=True)
+
+
+prefetcher = PagePrefetcher(settings.PREFETCH_PAGES, settings.PREFETCH_CONCURRENCY)
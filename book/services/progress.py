@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import time
+
+from sqlalchemy import BIGINT, Integer, column, select, values
+from sqlalchemy.dialects.postgresql import insert
+
+from config_data.config import settings
+from database.database import async_session
+from database.models import Book, User, UserProgress
+from services.metrics import Counter, Histogram
+
+
+logger = logging.getLogger(__name__)
+
+flush_latency = Histogram('progress_flush_seconds', 'Time spent flushing reading progress to the DB')
+flush_batch_size = Histogram(
+    'progress_flush_batch_size', 'Number of progress rows written per flush',
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000),
+)
+flush_errors = Counter('progress_flush_errors_total', 'Failed reading progress flushes')
+
+
+class ProgressTracker:
+    """
+    Буфер прогресса чтения. Последняя страница для пары (user_id, book_id)
+    хранится в памяти, а измененные записи периодически записываются
+    в user_progress одним upsert-запросом. Чтение идет из буфера
+    """
+
+    rows_per_query = 5000
+
+    def __init__(self, flush_interval: float, max_entries: int):
+        self.flush_interval = flush_interval
+        self.max_entries = max_entries
+        self._positions: dict[tuple[int, int], int] = {}
+        self._dirty: set[tuple[int, int]] = set()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    async def get(self, user_id: int, book_id: int) -> int | None:
+        """Последняя прочитанная страница или None, если пользователь не открывал книгу"""
+        key = (user_id, book_id)
+        if key in self._positions:
+            return self._positions[key]
+
+        async with async_session() as session:
+            result = await session.execute(
+                select(UserProgress.last_read_page)
+                .where(UserProgress.user_id == user_id, UserProgress.book_id == book_id)
+            )
+            page = result.scalars().first()
+        if page is not None and key not in self._positions:
+            self._positions[key] = page
+        return self._positions.get(key, page)
+
+    def set(self, user_id: int, book_id: int, page: int):
+        key = (user_id, book_id)
+        self._positions[key] = page
+        self._dirty.add(key)
+
+    def unsaved_books(self, user_id: int) -> list[int]:
+        """Книги пользователя, прогресс по которым еще не записан в БД"""
+        return [book_id for key_user_id, book_id in self._dirty if key_user_id == user_id]
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            batch = {key: self._positions[key] for key in self._dirty}
+            self._dirty.clear()
+
+            start = time.perf_counter()
+            try:
+                await self._write(batch)
+            except BaseException as error:
+                # Записи вернутся в следующий flush, в том числе если stop() отменил задачу во время записи
+                self._dirty.update(batch)
+                if isinstance(error, Exception):
+                    flush_errors.inc()
+                raise
+            flush_latency.observe(time.perf_counter() - start)
+            flush_batch_size.observe(len(batch))
+
+            if len(self._positions) > self.max_entries:
+                self._positions = {key: self._positions[key] for key in self._dirty}
+
+    async def _write(self, batch: dict[tuple[int, int], int]):
+        rows = [(user_id, book_id, page) for (user_id, book_id), page in batch.items()]
+        async with async_session() as session:
+            # asyncpg ограничивает число параметров запроса, поэтому пишем частями
+            for start in range(0, len(rows), self.rows_per_query):
+                await session.execute(self._upsert_query(rows[start:start + self.rows_per_query]))
+            await session.commit()
+
+    @staticmethod
+    def _upsert_query(rows: list[tuple[int, int, int]]):
+        rows = values(
+            column('user_id', BIGINT), column('book_id', Integer), column('last_read_page', Integer),
+            name='progress_batch',
+        ).data(rows)
+        # Строки для удаленных книг и незарегистрированных пользователей отбрасываются
+        query = insert(UserProgress).from_select(
+            ['user_id', 'book_id', 'last_read_page'],
+            select(rows.c.user_id, rows.c.book_id, rows.c.last_read_page)
+            .join(User, User.user_id == rows.c.user_id)
+            .join(Book, Book.id == rows.c.book_id)
+        )
+        return query.on_conflict_do_update(
+            index_elements=['user_id', 'book_id'],
+            set_={'last_read_page': query.excluded.last_read_page},
+        )
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception('Reading progress flush failed')
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+progress_tracker = ProgressTracker(settings.PROGRESS_FLUSH_INTERVAL, settings.PROGRESS_BUFFER_SIZE)
@@ -0,0 +1,67 @@
+import logging
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
+
+from config_data.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Последнее сообщение-читалка пользователя: user_id -> (chat_id, message_id)
+reader_messages: dict[int, tuple[int, int]] = {}
+# Книга, которую пользователь сейчас читает: user_id -> book_id
+current_books: dict[int, int] = {}
+
+
+def _is_unchanged(message: Message, text: str, reply_markup: InlineKeyboardMarkup) -> bool:
+    return message.text == text and message.reply_markup == reply_markup
+
+
+async def show_page(callback_query: CallbackQuery, text: str, reply_markup: InlineKeyboardMarkup,
+                    reuse_last: bool = False, book_id: int | None = None):
+    """
+    Показывает страницу книги, редактируя сообщение, на кнопку которого
+    нажал пользователь. При reuse_last редактируется последнее сообщение-читалка,
+    если оно ниже нажатого сообщения. Если отредактировать не получилось -
+    отправляется новое сообщение. book_id запоминается как текущая книга пользователя.
+    Текст страниц - сырой текст книги, поэтому разметка для него отключена
+    """
+    user_id = callback_query.from_user.id
+    if book_id is not None:
+        current_books[user_id] = book_id
+    message = callback_query.message
+    chat_id = message.chat.id
+
+    if not settings.READER_EDIT_IN_PLACE:
+        await _send_new(callback_query, chat_id, text, reply_markup)
+        return
+
+    message_id = message.message_id
+    last_reader = reader_messages.get(user_id)
+    if reuse_last and last_reader is not None and last_reader[0] == chat_id and last_reader[1] > message_id:
+        message_id = last_reader[1]
+    elif isinstance(message, Message) and _is_unchanged(message, text, reply_markup):
+        await callback_query.answer()
+        return
+
+    try:
+        await callback_query.bot.edit_message_text(
+            text=text, chat_id=chat_id, message_id=message_id, reply_markup=reply_markup,
+            parse_mode=None,
+        )
+    except TelegramBadRequest as error:
+        if 'message is not modified' not in error.message:
+            logger.debug('Reader message %s can not be edited: %s', message_id, error.message)
+            await _send_new(callback_query, chat_id, text, reply_markup)
+            return
+    reader_messages[user_id] = (chat_id, message_id)
+    await callback_query.answer()
+
+
+async def _send_new(callback_query: CallbackQuery, chat_id: int, text: str, reply_markup: InlineKeyboardMarkup):
+    sent = await callback_query.bot.send_message(
+        chat_id=chat_id, text=text, reply_markup=reply_markup, parse_mode=None
+    )
+    reader_messages[callback_query.from_user.id] = (chat_id, sent.message_id)
+    await callback_query.answer()
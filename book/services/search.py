@@ -0,0 +1,68 @@
+import re
+
+from sqlalchemy import Float, cast, func, literal, select, tuple_
+from sqlalchemy.dialects.postgresql import REGCONFIG
+
+from config_data.config import settings
+from database.database import async_session
+from database.models import Book, BookPage
+
+
+SNIPPET_RADIUS = 80
+
+# Последний поисковый запрос пользователя: user_id -> (запрос, id книги или None)
+search_queries: dict[int, tuple[str, int | None]] = {}
+
+
+# Запасного индекса для SQLite нет: бот работает только на Postgres - книги загружаются
+# через COPY, пользователи и прогресс пишутся INSERT ... ON CONFLICT, а поиск держится
+# на tsvector и GIN-индексе
+def _search_config():
+    return literal(settings.SEARCH_LANGUAGE, REGCONFIG)
+
+
+def to_search_vector(text_expression):
+    return func.to_tsvector(_search_config(), text_expression)
+
+
+async def search_pages(query: str, book_id: int | None = None,
+                       after: tuple[float, int] | None = None, limit: int = 5):
+    """
+    Ищет страницы по индексу tsvector и отдает их по убыванию релевантности.
+    Следующая порция запрашивается по (rank, page_id) последнего результата.
+    Возвращает строки (page_id, book_id, book_name, page_no, rank) и признак,
+    что результатов больше, чем limit
+    """
+    ts_query = func.websearch_to_tsquery(_search_config(), query)
+    rank = cast(func.ts_rank_cd(BookPage.search_vector, ts_query), Float(precision=53))
+    statement = (
+        select(BookPage.id, BookPage.book_id, Book.name, BookPage.page_no, rank.label('rank'))
+        .join(Book, Book.id == BookPage.book_id)
+        .where(BookPage.search_vector.op('@@')(ts_query))
+    )
+    if book_id is not None:
+        statement = statement.where(BookPage.book_id == book_id)
+    if after is not None:
+        statement = statement.where(tuple_(rank, BookPage.id) < tuple_(*after))
+    statement = statement.order_by(rank.desc(), BookPage.id.desc()).limit(limit + 1)
+
+    async with async_session() as session:
+        result = await session.execute(statement)
+        hits = result.all()
+    return hits[:limit], len(hits) > limit
+
+
+def make_snippet(page_text: str, query: str) -> str:
+    """Кусок текста страницы вокруг первого найденного слова запроса"""
+    lower_text = page_text.lower()
+    position = -1
+    for word in re.findall(r'\w{3,}', query.lower()):
+        # Обрезаем окончание, чтобы найти слово в другой форме
+        position = lower_text.find(word[:max(3, len(word) - 2)])
+        if position != -1:
+            break
+    position = max(position, 0)
+    start = max(0, position - SNIPPET_RADIUS)
+    end = min(len(page_text), position + SNIPPET_RADIUS)
+    snippet = ' '.join(page_text[start:end].split())
+    return f"{'…' if start > 0 else ''}{snippet}{'…' if end < len(page_text) else ''}"
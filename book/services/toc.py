@@ -0,0 +1,154 @@
+import bisect
+import re
+
+from sqlalchemy import select
+
+from database.cache import book_versions
+from database.database import async_session
+from database.models import TocEntry
+
+
+MAX_TITLE_LENGTH = 100
+# Больше заголовков в оглавлении не собирается: память на загрузку книги ограничена
+MAX_TOC_ENTRIES = 5000
+
+# Заголовки в простом тексте: короткие строки вида "Глава 1", "ЧАСТЬ ВТОРАЯ",
+# "Chapter IV. Title", "Пролог" и т.п., отделенные от текста пустыми строками.
+# После ключевого слова обязателен номер: цифры, римские цифры или порядковое слово,
+# а после номера - знак препинания или название с заглавной буквы
+TXT_HEADING_NUMBER = (
+    r'(?:\d+(?:\.\d+)*'
+    r'|(?:xc|xl|l?x{0,3})(?:ix|iv|v?i{0,3})(?<=[ivxlc])'
+    r'|(?:перв|втор|трет|четв[её]рт|пят|шест|седьм|восьм|девят|десят|одиннадцат|двенадцат|тринадцат'
+    r'|четырнадцат|пятнадцат|шестнадцат|семнадцат|восемнадцат|девятнадцат|двадцат|последн|заключительн)\w*'
+    r'|one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve|\w+teen|twenty|thirty'
+    r'|first|second|third|fourth|fifth|sixth|seventh|eighth|ninth|tenth|eleventh|twelfth|\w+teenth'
+    r'|twentieth|thirtieth|last|final)\b'
+)
+TXT_HEADING_RE = re.compile(
+    r'\n[ \t\r]*\n[ \t]*(?=[^\n]{1,80}\n)(?P<title>(?:(?P<part>часть|книга|part|book)|глава|раздел|chapter|section)'
+    r'[ \t]+' + TXT_HEADING_NUMBER + r'(?:[.:)—–-][^\n]*?|[ \t]+(?-i:[A-ZА-ЯЁ"«])[^\n]*?)?|пролог|эпилог|предисловие|введение|заключение|послесловие'
+    r'|prologue|epilogue|preface|introduction|conclusion)[ \t\r]*(?=\n[ \t\r]*\n)',
+    re.IGNORECASE,
+)
+# Сколько текста в конце части переносится в следующую часть для поиска заголовков
+MAX_TXT_TAIL_LENGTH = 1024
+
+
+class TocBuilder:
+    """
+    Собирает оглавление книги во время загрузки. Заголовки копятся
+    со смещением в исходном тексте, а в конце загрузки смещения
+    переводятся в номера страниц по page_starts разбивателя
+    """
+
+    def __init__(self):
+        self._headings: list[tuple[int, int, str]] = []
+
+    def add(self, offset: int, level: int, title: str):
+        title = ' '.join(title.split())[:MAX_TITLE_LENGTH]
+        if title and len(self._headings) < MAX_TOC_ENTRIES:
+            self._headings.append((offset, level, title))
+
+    def on_chunk(self, chunk: str, offset: int):
+        """Вызывается для каждой части текста книги перед разбиением на страницы"""
+
+    def entries(self, page_starts: list[int]) -> list[dict]:
+        if not page_starts:
+            return []
+        return [
+            {
+                'ordinal': ordinal,
+                'title': title,
+                'level': level,
+                'page_no': max(0, bisect.bisect_right(page_starts, offset) - 1),
+            }
+            for ordinal, (offset, level, title) in enumerate(sorted(self._headings, key=lambda h: h[0]))
+        ]
+
+
+class TextTocBuilder(TocBuilder):
+    """Ищет строки-заголовки глав в простом тексте"""
+
+    def __init__(self):
+        super().__init__()
+        # Начало книги считается началом после пустой строки
+        self._tail = '\n\n'
+        self._tail_offset = 0
+        self._next_offset = 0
+
+    def on_chunk(self, chunk: str, offset: int):
+        text = self._tail + chunk
+        text_offset = offset - len(self._tail)
+        self._tail_offset = offset + len(chunk)
+        for match in TXT_HEADING_RE.finditer(text):
+            heading_offset = text_offset + match.start('title')
+            # Перенесенный из прошлой части текст просматривается повторно
+            if heading_offset >= self._next_offset:
+                self.add(heading_offset, 1 if match.group('part') else 2, match.group('title'))
+                self._next_offset = heading_offset + 1
+
+        # Заголовок проверяется вместе с пустыми строками вокруг него, поэтому
+        # две последние полные строки и незаконченная переносятся в следующую часть
+        cut = len(text)
+        for _ in range(3):
+            cut = text.rfind('\n', 0, cut)
+            if cut == -1:
+                cut = 0
+                break
+        self._tail = text[max(cut, len(text) - MAX_TXT_TAIL_LENGTH):]
+
+    def entries(self, page_starts: list[int]) -> list[dict]:
+        self.on_chunk('\n\n', self._tail_offset)
+        levels = {level for _, level, _ in self._headings}
+        if levels == {2}:
+            self._headings = [(offset, 1, title) for offset, _, title in self._headings]
+        return super().entries(page_starts)
+
+
+class PdfTocBuilder(TocBuilder):
+    """Переносит оглавление (outline) PDF на страницы книги"""
+
+    def __init__(self, outline: list[tuple[int, str, int]]):
+        super().__init__()
+        self._outline = outline
+        self._pdf_page_offsets: list[int] = []
+
+    def on_chunk(self, chunk: str, offset: int):
+        # Текст PDF приходит постранично, поэтому каждая часть - одна страница PDF
+        self._pdf_page_offsets.append(offset)
+
+    def entries(self, page_starts: list[int]) -> list[dict]:
+        for level, title, pdf_page in self._outline:
+            if 1 <= pdf_page <= len(self._pdf_page_offsets):
+                self.add(self._pdf_page_offsets[pdf_page - 1], level, title)
+        return super().entries(page_starts)
+
+
+class TocIndex:
+    """Оглавления книг в памяти: загружаются из БД один раз на книгу"""
+
+    def __init__(self):
+        self._books: dict[int, list[tuple[str, int, int]]] = {}
+
+    async def get(self, book_id: int) -> list[tuple[str, int, int]]:
+        """Список (заголовок, уровень, номер страницы) в порядке оглавления"""
+        entries = self._books.get(book_id)
+        if entries is None:
+            version = book_versions.get(book_id)
+            async with async_session() as session:
+                result = await session.execute(
+                    select(TocEntry.title, TocEntry.level, TocEntry.page_no)
+                    .where(TocEntry.book_id == book_id)
+                    .order_by(TocEntry.ordinal)
+                )
+                entries = [tuple(row) for row in result.all()]
+            if book_versions.get(book_id) == version:
+                self._books[book_id] = entries
+        return entries
+
+    def invalidate_book(self, book_id: int):
+        self._books.pop(book_id, None)
+
+
+toc_index = TocIndex()
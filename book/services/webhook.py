@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from config_data.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class LimitedRequestHandler(SimpleRequestHandler):
+    """
+    Обработчик вебхука, который ограничивает число одновременно
+    обрабатываемых апдейтов. Когда все слоты заняты, ответ Telegram
+    задерживается, и он сам притормаживает отправку новых апдейтов
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, concurrency: int, **kwargs: Any):
+        super().__init__(dispatcher, bot, handle_in_background=True, **kwargs)
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        await self._semaphore.acquire()
+        try:
+            return await super()._handle_request_background(bot, request)
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    async def _background_feed_update(self, bot: Bot, update: dict[str, Any]) -> None:
+        try:
+            await super()._background_feed_update(bot, update)
+        finally:
+            self._semaphore.release()
+
+
+def create_webhook_app(dp: Dispatcher, bot: Bot) -> web.Application:
+    app = web.Application()
+    LimitedRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        concurrency=settings.UPDATE_CONCURRENCY,
+        secret_token=settings.WEBHOOK_SECRET,
+    ).register(app, path=settings.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """Принимает апдейты через вебхук вместо long polling"""
+    if not settings.WEBHOOK_SECRET:
+        logger.warning('WEBHOOK_SECRET is not set, webhook requests are not authenticated')
+
+    app = create_webhook_app(dp, bot)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=settings.WEBHOOK_HOST, port=settings.WEBHOOK_PORT)
+    await site.start()
+
+    await bot.set_webhook(
+        url=f'{settings.WEBHOOK_URL.rstrip("/")}{settings.WEBHOOK_PATH}',
+        secret_token=settings.WEBHOOK_SECRET,
+        max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+        drop_pending_updates=True,
+    )
+    logger.info('Webhook server listening on %s:%s', settings.WEBHOOK_HOST, settings.WEBHOOK_PORT)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
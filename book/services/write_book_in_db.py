@@ -1,80 +1,346 @@
 import os
 import asyncio
-import fitz
-import aiofiles
+import hashlib
+import logging
+import time
+from sqlalchemy import Integer, LargeBinary, Text, column, delete, insert, literal, null, select, table, text
+from config_data.config import settings
+from database.cache import book_versions, page_cache
+from database.compression import ingest_codec_name, make_codec, train_dictionary
 from database.database import async_session
-from database.models import Book, BookPage
+from database.models import Book, BookFile, BookPage, TocEntry
+from database.page_store import PageStoreWriter, page_store, remove_book_files
+from database.pages import invalidate_book_codec, invalidate_book_page_count
+from keyboards.keyboard_cache import keyboard_cache
+from services.ebooks import iter_epub_text, iter_fb2_text
+from services.extractors import get_pdf_outline, iter_pdf_text, iter_txt_text
+from services.paginator import PageSplitter
+from services.search import to_search_vector
+from services.toc import PdfTocBuilder, TextTocBuilder, TocBuilder, toc_index
+
+
+logger = logging.getLogger(__name__)
+
+
+class IngestProgress:
+    """Прогресс одной проверки папки с книгами"""
+
+    def __init__(self):
+        self.files_total = 0
+        self.files_done = 0
+        self.files_failed = 0
+        self.pages = 0
+        self.failed_files: list[str] = []
+        self.started = time.monotonic()
+        self.finished: float | None = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.elapsed if self.elapsed > 0 else 0.0
 
 
 class BookWriter:
     folder_path = "books"
+    hash_chunk_size = 1024 * 1024
+    page_batch_size = 500
+    staging_table = 'book_page_staging'
+    extensions = ('.txt', '.pdf', '.fb2', '.epub')
 
-    async def store_pdf_content(self, pdf_path):
-        async with aiofiles.open(pdf_path, 'rb') as file:
-            pdf_reader = fitz.open(pdf_path)
-            text = ""
-            for page_num in range(pdf_reader.page_count):
-                page = pdf_reader[page_num]
-                text += page.get_text()
+    def __init__(self):
+        self.progress = IngestProgress()
+        self._semaphore = asyncio.Semaphore(settings.INGEST_CONCURRENCY)
+        self._scan_task: asyncio.Task | None = None
 
-        async with async_session() as session:
-            file_name = pdf_path.split("/")[-1]
-            write_file_name = file_name.split(".")[0]
-            new_book = Book(name=write_file_name)
-            text_dict = await self._get_part_text(text=text)
+    async def store_pdf_content(self, pdf_path, source):
+        toc = PdfTocBuilder(await get_pdf_outline(pdf_path))
+        await self._store_book(pdf_path, iter_pdf_text(pdf_path), toc, source)
 
-            async with session.begin():
-                session.add(new_book)
-                await session.flush()
-                mappings = [{'text': value, 'book_id': new_book.id} for key, value in text_dict.items()]
-                await session.run_sync(
-                    lambda sync_session: sync_session.bulk_insert_mappings(BookPage, mappings)
-                )
-                await session.commit()
-
-    async def store_txt_content(self, file_path):
-        async with aiofiles.open(file_path, 'r', encoding='utf-8') as file:
-            text = await file.read()
-        file_name = file_path.split("/")[-1]
+    async def store_txt_content(self, file_path, source):
+        await self._store_book(file_path, iter_txt_text(file_path), TextTocBuilder(), source)
+
+    async def store_fb2_content(self, file_path, source):
+        toc = TocBuilder()
+        await self._store_book(file_path, iter_fb2_text(file_path, toc), toc, source)
+
+    async def store_epub_content(self, file_path, source):
+        toc = TocBuilder()
+        await self._store_book(file_path, iter_epub_text(file_path, toc), toc, source)
+
+    async def _store_book(self, file_path, chunks, toc, source):
+        """
+        Записывает страницы книги в БД по мере поступления текста из chunks,
+        а в конце - оглавление, собранное toc. Если книга уже была загружена
+        из этого файла раньше - ее страницы и оглавление заменяются новыми
+        """
+        file_name = os.path.basename(file_path)
         write_file_name = file_name.split(".")[0]
-        new_book = Book(name=write_file_name)
-        text_dict = await self._get_part_text(text=text)
 
-        async with async_session() as session:
-            async with session.begin():
-                session.add(new_book)
-                await session.flush()
-                mappings = [{'text': value, 'book_id': new_book.id} for key, value in text_dict.items()]
-                await session.run_sync(
-                    lambda sync_session: sync_session.bulk_insert_mappings(BookPage, mappings)
-                )
-                await session.commit()
+        store_writer = None
+        try:
+            async with async_session() as session:
+                async with session.begin():
+                    result = await session.execute(select(Book).where(Book.name == write_file_name))
+                    book = result.scalars().first()
+                    if book is None:
+                        book = Book(name=write_file_name)
+                        session.add(book)
+                        await session.flush()
+                    else:
+                        await session.execute(delete(BookPage).where(BookPage.book_id == book.id))
+                        await session.execute(delete(TocEntry).where(TocEntry.book_id == book.id))
+
+                    await self._create_staging_table(session)
+                    # В файловом хранилище страницы не сжимаются: их отдают прямо из mmap
+                    if settings.PAGE_BACKEND == 'mmap':
+                        store_writer = await asyncio.to_thread(PageStoreWriter, settings.PAGE_STORE_DIR, book.id)
+                        codec_name = None
+                    else:
+                        codec_name = ingest_codec_name(settings.PAGE_COMPRESSION)
+                    codec = None
+                    book.page_codec = codec_name
+                    book.page_dictionary = None
+                    splitter = PageSplitter()
+                    page_count = 0
+                    async for batch in self._page_batches(chunks, toc, splitter):
+                        if store_writer is not None:
+                            await asyncio.to_thread(store_writer.append, batch)
+                        elif codec_name is not None and codec is None:
+                            codec = await self._make_book_codec(book, codec_name, batch)
+                        await self._insert_pages(session, batch, page_count, codec)
+                        await self._move_staged_pages(
+                            session, book.id, keep_text=codec_name is None and store_writer is None
+                        )
+                        page_count += len(batch)
+                        self.progress.pages += len(batch)
+                    book.page_count = page_count
+                    book.page_store_checksum = (
+                        await asyncio.to_thread(store_writer.finish) if store_writer is not None else None
+                    )
+
+                    toc_entries = toc.entries(splitter.page_starts)
+                    if toc_entries:
+                        await session.execute(
+                            insert(TocEntry), [dict(entry, book_id=book.id) for entry in toc_entries]
+                        )
+
+                    result = await session.execute(select(BookFile).where(BookFile.file_name == file_name))
+                    book_file = result.scalars().first()
+                    if book_file is None:
+                        book_file = BookFile(file_name=file_name)
+                        session.add(book_file)
+                    book_file.book_id = book.id
+                    book_file.content_hash = source['content_hash']
+                    book_file.size = source['size']
+                    book_file.mtime = source['mtime']
+        except BaseException:
+            if store_writer is not None:
+                await asyncio.to_thread(store_writer.abort)
+            raise
+
+        # Запросы к БД, начатые до перезагрузки, не вернут в кэши прежнюю версию книги
+        book_versions.bump(book.id)
+        page_cache.invalidate_book(book.id)
+        invalidate_book_codec(book.id)
+        invalidate_book_page_count(book.id)
+        page_store.invalidate_book(book.id)
+        toc_index.invalidate_book(book.id)
+        keyboard_cache.invalidate_book(book.id)
+        await asyncio.to_thread(remove_book_files, settings.PAGE_STORE_DIR, book.id, book.page_store_checksum)
+        logger.info('Book "%s" ingested from %s', write_file_name, file_name)
+
+    async def _page_batches(self, chunks, toc, splitter):
+        """Разбивает текст из chunks на страницы и отдает их порциями по page_batch_size"""
+        batch = []
+        offset = 0
+        async for chunk in chunks:
+            toc.on_chunk(chunk, offset)
+            offset += len(chunk)
+            batch.extend(splitter.feed(chunk))
+            if len(batch) >= self.page_batch_size:
+                yield batch
+                batch = []
+        batch.extend(splitter.close())
+        if batch:
+            yield batch
+
+    @classmethod
+    async def _create_staging_table(cls, session):
+        """Временная таблица для COPY, удаляется при завершении транзакции"""
+        await session.execute(text(
+            f'CREATE TEMP TABLE {cls.staging_table} (page_no integer, text text, text_z bytea) ON COMMIT DROP'
+        ))
+
+    @staticmethod
+    async def _make_book_codec(book, codec_name, samples):
+        """Кодек для страниц книги, словарь обучается на первой порции страниц"""
+        if settings.PAGE_COMPRESSION_DICTIONARY:
+            book.page_dictionary = await asyncio.to_thread(train_dictionary, codec_name, samples)
+        return make_codec(codec_name, settings.PAGE_COMPRESSION_LEVEL, book.page_dictionary)
+
+    @classmethod
+    async def _insert_pages(cls, session, pages, first_page_no, codec=None):
+        if codec is None:
+            compressed = [None] * len(pages)
+        else:
+            compressed = await asyncio.to_thread(lambda: [codec.compress(page_text) for page_text in pages])
+        # COPY идет через соединение asyncpg сессии и попадает в ее транзакцию
+        connection = await session.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            cls.staging_table,
+            records=zip(range(first_page_no, first_page_no + len(pages)), pages, compressed),
+            columns=('page_no', 'text', 'text_z'),
+        )
+
+    @classmethod
+    async def _move_staged_pages(cls, session, book_id, keep_text=True):
+        """
+        Переносит порцию страниц из временной таблицы в book_page вместе
+        с tsvector и очищает временную таблицу: каждый запрос обрабатывает
+        одну порцию и укладывается в statement_timeout. Текст сжатых страниц
+        хранится только в text_z, а у книг в файловом хранилище - только в файлах
+        """
+        staging = table(
+            cls.staging_table, column('page_no', Integer), column('text', Text), column('text_z', LargeBinary)
+        )
+        await session.execute(
+            insert(BookPage).from_select(
+                ['book_id', 'page_no', 'text', 'text_z', 'search_vector'],
+                select(
+                    literal(book_id, Integer),
+                    staging.c.page_no,
+                    staging.c.text if keep_text else null(),
+                    staging.c.text_z,
+                    to_search_vector(staging.c.text),
+                ),
+            )
+        )
+        await session.execute(text(f'TRUNCATE {cls.staging_table}'))
 
     async def check_books_folder(self):
-        tasks = []
+        """
+        Сверяет файлы в папке с книгами с манифестом в БД и загружает
+        только новые или изменившиеся файлы
+        """
+        async with async_session() as session:
+            result = await session.execute(select(BookFile))
+            manifest = {book_file.file_name: book_file for book_file in result.scalars().all()}
+
+        changed = []
         for file_name in os.listdir(self.folder_path):
             if file_name.endswith('.txt'):
-                task = asyncio.create_task(self.store_txt_content(os.path.join(self.folder_path, file_name)))
-                tasks.append(task)
+                store = self.store_txt_content
             elif file_name.endswith('.pdf'):
-                task = asyncio.create_task(self.store_pdf_content(os.path.join(self.folder_path, file_name)))
-                tasks.append(task)
-        await asyncio.gather(*tasks)
+                store = self.store_pdf_content
+            elif file_name.endswith('.fb2'):
+                store = self.store_fb2_content
+            elif file_name.endswith('.epub'):
+                store = self.store_epub_content
+            else:
+                continue
 
-    @staticmethod
-    async def _get_part_text(text: str, maxsize: int = 4000):
-        counter = 1
-        result_dict = dict()
-        text_to_dict = ''
+            file_path = os.path.join(self.folder_path, file_name)
+            stat = os.stat(file_path)
+            known = manifest.get(file_name)
+            if known is not None and known.size == stat.st_size and known.mtime == stat.st_mtime:
+                continue
+
+            content_hash = await asyncio.to_thread(self._hash_file, file_path)
+            if known is not None and known.content_hash == content_hash:
+                await self._touch_manifest(file_name, stat)
+                continue
+
+            source = {'content_hash': content_hash, 'size': stat.st_size, 'mtime': stat.st_mtime}
+            changed.append((store, file_path, source))
+
+        # Все файлы посчитаны до начала загрузки, чтобы прогресс не показывал "3 из 0"
+        self.progress.files_total = len(changed)
+        tasks = [asyncio.create_task(self._ingest_file(*args)) for args in changed]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error('Book ingestion failed', exc_info=result)
+
+    async def _ingest_file(self, store, file_path, source):
+        """Загружает один файл, одновременно - не больше INGEST_CONCURRENCY файлов"""
+        async with self._semaphore:
+            try:
+                await store(file_path, source)
+            except Exception:
+                self.progress.files_failed += 1
+                self.progress.failed_files.append(os.path.basename(file_path))
+                raise
+            self.progress.files_done += 1
 
-        for index, letter in enumerate(text):
-            text_to_dict += letter
-            if (index + 1) % maxsize == 0 or index == len(text) - 1:
-                result_dict[counter] = text_to_dict
-                counter += 1
-                text_to_dict = ''
+    async def _touch_manifest(self, file_name, stat):
+        """Файл не изменился по содержимому - обновляем только размер и mtime"""
+        async with async_session() as session:
+            async with session.begin():
+                result = await session.execute(select(BookFile).where(BookFile.file_name == file_name))
+                book_file = result.scalars().first()
+                book_file.size = stat.st_size
+                book_file.mtime = stat.st_mtime
+
+    @classmethod
+    def _hash_file(cls, file_path):
+        sha256 = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            while chunk := file.read(cls.hash_chunk_size):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    async def _scan(self):
+        self.progress = IngestProgress()
+        try:
+            await self.check_books_folder()
+        finally:
+            self.progress.finished = time.monotonic()
+
+    @property
+    def scanning(self) -> bool:
+        return self._scan_task is not None and not self._scan_task.done()
 
-        return result_dict
+    def start_scan(self) -> asyncio.Task:
+        """Запускает проверку папки в фоне или возвращает уже идущую"""
+        if self._scan_task is None or self._scan_task.done():
+            self._scan_task = asyncio.create_task(self._scan())
+        return self._scan_task
+
+    def _folder_snapshot(self):
+        snapshot = {}
+        for file_name in os.listdir(self.folder_path):
+            if file_name.endswith(self.extensions):
+                stat = os.stat(os.path.join(self.folder_path, file_name))
+                snapshot[file_name] = (stat.st_size, stat.st_mtime)
+        return snapshot
+
+    async def watch(self, interval, scanned):
+        """
+        Опрашивает размеры и mtime файлов в папке с книгами и запускает
+        проверку, когда они изменились. Файлы могут еще копироваться,
+        поэтому проверка ждет, пока папка не перестанет меняться
+        """
+        previous = scanned
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                current = await asyncio.to_thread(self._folder_snapshot)
+                if current == previous and current != scanned:
+                    await self.start_scan()
+                    scanned = current
+                previous = current
+            except Exception:
+                logger.exception('Books folder check failed')
 
     async def run(self):
-        await self.check_books_folder()
+        snapshot = await asyncio.to_thread(self._folder_snapshot)
+        await self.start_scan()
+        if settings.WATCH_BOOKS_FOLDER:
+            await self.watch(settings.WATCH_INTERVAL, snapshot)
+
+
+book_writer = BookWriter()
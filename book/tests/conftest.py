@@ -0,0 +1,79 @@
+import asyncio
+import os
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import AnswerCallbackQuery, EditMessageText, SendMessage
+from aiogram.types import Chat, Message
+
+
+# Настройки читаются при импорте модулей бота. Заглушки задаются до импорта,
+# чтобы тесты не подхватили настоящие TOKEN и БД из .env
+os.environ.setdefault('TOKEN', '1:test')
+os.environ.setdefault('ADMIN_IDS', '1')
+os.environ.setdefault('POSTGRES_HOST', '127.0.0.1')
+os.environ.setdefault('POSTGRES_PORT', '5432')
+os.environ.setdefault('POSTGRES_DB', 'book_bot_test')
+os.environ.setdefault('POSTGRES_USER', 'postgres')
+os.environ.setdefault('POSTGRES_PASSWORD', 'postgres')
+
+
+def pytest_collection_modifyitems(config, items):
+    if os.environ.get('TEST_POSTGRES') == '1':
+        return
+    skip = pytest.mark.skip(reason='set TEST_POSTGRES=1 and POSTGRES_* to run tests against PostgreSQL')
+    for item in items:
+        if 'postgres' in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(scope='session')
+def migrated_db():
+    """Тестовая БД, обновленная миграциями до последней версии"""
+    from alembic import command
+    from alembic.config import Config
+
+    # alembic ходит в БД через asyncpg с async_fallback, ему нужен текущий цикл событий,
+    # а asyncio.run() в предыдущих тестах его сбрасывает
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        command.upgrade(Config(os.path.join(os.path.dirname(__file__), '..', 'alembic.ini')), 'head')
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+class RecordingSession(BaseSession):
+    """Сессия бота без сети: запоминает отправленные и отредактированные сообщения и ответы на нажатия"""
+
+    def __init__(self):
+        super().__init__()
+        self.sent: list[str] = []
+        self.answered: list[str | None] = []
+
+    async def make_request(self, bot, method, timeout=None):
+        if isinstance(method, (SendMessage, EditMessageText)):
+            self.sent.append(method.text)
+            return Message(
+                message_id=len(self.sent), date=0, text=method.text,
+                chat=Chat(id=method.chat_id, type='private'),
+            )
+        if isinstance(method, AnswerCallbackQuery):
+            self.answered.append(method.text)
+            return True
+        raise AssertionError(f'Unexpected API call {type(method).__name__}')
+
+    async def close(self):
+        pass
+
+    async def stream_content(self, *args, **kwargs):
+        raise NotImplementedError
+        yield b''
+
+
+@pytest.fixture
+def bot() -> Bot:
+    """Бот без сети, отправленные тексты копятся в bot.session.sent"""
+    return Bot('1:test', session=RecordingSession())
@@ -0,0 +1,14 @@
+from handlers.admin_handlers import _format_progress
+from services.write_book_in_db import IngestProgress
+
+
+def test_failed_file_names_are_escaped():
+    progress = IngestProgress()
+    progress.files_total = 2
+    progress.files_failed = 1
+    progress.failed_files = ['<b>&book.txt']
+
+    text = _format_progress(progress, finished=True)
+
+    assert '&lt;b&gt;&amp;book.txt' in text
+    assert '<b>&book' not in text
@@ -0,0 +1,92 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from database import page_store as page_store_module
+from database import pages
+from database.cache import book_versions, page_cache
+from database.page_store import PageStore
+from services import toc
+from services.toc import TocIndex
+
+
+BOOK_ID = 987654
+
+
+class _ReingestingSession:
+    """
+    Сессия БД с заготовленными ответами (значение, перезагружается ли
+    книга во время этого запроса)
+    """
+
+    def __init__(self, *results: tuple):
+        self._results = list(results)
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def execute(self, statement, *args):
+        value, reingest = self._results.pop(0)
+        if reingest:
+            book_versions.bump(BOOK_ID)
+        return SimpleNamespace(
+            one=lambda: value, one_or_none=lambda: value, all=lambda: value,
+            scalar_one_or_none=lambda: value,
+        )
+
+
+@pytest.fixture(autouse=True)
+def clean_caches():
+    yield
+    page_cache.invalidate_book(BOOK_ID)
+    pages.invalidate_book_codec(BOOK_ID)
+    pages.invalidate_book_page_count(BOOK_ID)
+    pages.page_store.invalidate_book(BOOK_ID)
+
+
+def test_page_read_during_reingest_is_not_cached(monkeypatch):
+    monkeypatch.setattr(pages, 'async_session', _ReingestingSession((SimpleNamespace(text='old', text_z=None), True)))
+    pages.page_store._db_books.add(BOOK_ID)
+
+    assert asyncio.run(pages.get_page(BOOK_ID, 0)) == 'old'
+    assert (BOOK_ID, 0) not in page_cache
+
+
+def test_prefetch_during_reingest_is_not_cached(monkeypatch):
+    monkeypatch.setattr(pages, 'async_session', _ReingestingSession(([(0, 'old', None)], True)))
+    pages.page_store._db_books.add(BOOK_ID)
+
+    asyncio.run(pages.prefetch_pages(BOOK_ID, 0, 1))
+    assert (BOOK_ID, 0) not in page_cache
+
+
+def test_page_count_and_codec_during_reingest_are_not_cached(monkeypatch):
+    monkeypatch.setattr(pages, 'async_session', _ReingestingSession((10, True), (('zlib', None), True)))
+
+    assert asyncio.run(pages.get_page_count(BOOK_ID)) == 10
+    asyncio.run(pages._get_codec(BOOK_ID))
+    assert BOOK_ID not in pages._page_counts
+    assert BOOK_ID not in pages._book_codecs
+
+
+def test_toc_during_reingest_is_not_cached(monkeypatch):
+    monkeypatch.setattr(toc, 'async_session', _ReingestingSession(([('Глава 1', 1, 0)], True)))
+    toc_index = TocIndex()
+
+    assert asyncio.run(toc_index.get(BOOK_ID)) == [('Глава 1', 1, 0)]
+    assert BOOK_ID not in toc_index._books
+
+
+def test_page_store_rereads_checksum_after_reingest(monkeypatch, tmp_path):
+    # Файлы прежней версии удалены, новая версия хранится в БД
+    monkeypatch.setattr(page_store_module, 'async_session', _ReingestingSession(('old-checksum', True), (None, False)))
+    store = PageStore(str(tmp_path))
+
+    assert asyncio.run(store.is_stored(BOOK_ID)) is False
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+from aiogram import Dispatcher, Router
+from aiogram.types import Message
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from database.database import DATABASE_URL, InstrumentedPool
+from handlers import other_handlers
+from messages.messages import LEXICON
+
+
+POOL_SIZE = 2
+MAX_OVERFLOW = 1
+HANDLERS = 12
+QUERY_SECONDS = 1.0
+POOL_TIMEOUT = 0.3
+
+
+def _update(update_id: int) -> dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': update_id, 'type': 'private'},
+            'from': {'id': update_id, 'is_bot': False, 'first_name': 'Test'},
+            'text': 'read',
+        },
+    }
+
+
+async def _run_handlers(bot):
+    engine = create_async_engine(
+        DATABASE_URL, poolclass=InstrumentedPool,
+        pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT,
+    )
+    session_factory = async_sessionmaker(engine)
+    router = Router()
+
+    @router.message()
+    async def slow_query(message: Message):
+        async with session_factory() as session:
+            await session.execute(text('SELECT pg_sleep(:seconds)'), {'seconds': QUERY_SECONDS})
+        await message.answer('done')
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    dp.include_router(other_handlers.router)
+    try:
+        await asyncio.gather(*(dp.feed_raw_update(bot, _update(update_id)) for update_id in range(HANDLERS)))
+        # Соединения апдейтов, получивших отказ, не остаются занятыми
+        return bot.session.sent, engine.pool.checkedout()
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.postgres
+def test_exhausted_pool_answers_busy_instead_of_waiting(migrated_db, bot):
+    sent, checked_out = asyncio.run(asyncio.wait_for(_run_handlers(bot), timeout=QUERY_SECONDS * HANDLERS))
+
+    capacity = POOL_SIZE + MAX_OVERFLOW
+    assert sent.count('done') == capacity
+    assert sent.count(LEXICON['busy']) == HANDLERS - capacity
+    assert checked_out == 0
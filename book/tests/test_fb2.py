@@ -0,0 +1,85 @@
+import asyncio
+from xml.etree import ElementTree
+
+import pytest
+
+from services.ebooks import TEXT_CHUNK_SIZE, iter_fb2_text
+from services.extractors import shutdown_process_pool
+from services.toc import TocBuilder
+
+
+SECTIONS = 40
+PARAGRAPHS = 300
+
+
+def _write_fb2(path) -> str:
+    paragraph = 'Реляционная модель данных описывает таблицы, строки и связи между ними.'
+    sections = ''.join(
+        f'<section><title><p>Глава {number}</p></title>' + f'<p>{paragraph}</p>' * PARAGRAPHS + '</section>'
+        for number in range(1, SECTIONS + 1)
+    )
+    path.write_text(
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<FictionBook xmlns="http://www.gribuser.ru/xml/fictionbook/2.0">'
+        '<description><title-info><book-title>Тест</book-title></title-info></description>'
+        f'<body>{sections}</body>'
+        '<body name="notes"><section><title><p>Примечание</p></title><p>Текст примечания</p></section></body>'
+        '</FictionBook>',
+        encoding='utf-8',
+    )
+    return paragraph
+
+
+@pytest.fixture(autouse=True)
+def single_worker(monkeypatch):
+    # С одним процессом в пуле зависший производитель заблокировал бы следующую книгу
+    monkeypatch.setattr('services.extractors._pool_workers', lambda: 1)
+    yield
+    shutdown_process_pool()
+
+
+def test_fb2_is_read_in_chunks_with_headings(tmp_path):
+    path = tmp_path / 'book.fb2'
+    paragraph = _write_fb2(path)
+
+    async def read():
+        toc = TocBuilder()
+        chunks = [chunk async for chunk in iter_fb2_text(str(path), toc)]
+        return chunks, toc
+
+    chunks, toc = asyncio.run(read())
+    text = ''.join(chunks)
+
+    assert len(chunks) > 1
+    assert max(map(len, chunks)) < TEXT_CHUNK_SIZE * 2
+    assert text.count(paragraph) == SECTIONS * PARAGRAPHS
+    assert 'Текст примечания' in text
+    # Примечания из второго body в оглавление не попадают
+    assert [title for _, _, title in toc._headings] == [f'Глава {number}' for number in range(1, SECTIONS + 1)]
+    for offset, _, title in toc._headings:
+        assert text[offset:offset + len(title)] == title
+
+
+def test_fb2_parse_error_is_raised(tmp_path):
+    path = tmp_path / 'broken.fb2'
+    path.write_text('<FictionBook><body><p>Текст', encoding='utf-8')
+
+    async def read():
+        return [chunk async for chunk in iter_fb2_text(str(path), TocBuilder())]
+
+    with pytest.raises(ElementTree.ParseError):
+        asyncio.run(read())
+
+
+def test_stopped_fb2_reading_frees_the_worker(tmp_path):
+    path = tmp_path / 'book.fb2'
+    _write_fb2(path)
+
+    async def read():
+        async for _ in iter_fb2_text(str(path), TocBuilder()):
+            break
+        # Следующая книга получает тот же единственный процесс пула
+        return [chunk async for chunk in iter_fb2_text(str(path), TocBuilder())]
+
+    chunks = asyncio.run(asyncio.wait_for(read(), timeout=30))
+    assert chunks
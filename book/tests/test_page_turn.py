@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+from aiogram.types import CallbackQuery, Chat, Message, User
+from sqlalchemy import delete, insert
+
+from database.cache import page_cache
+from database.database import async_session, engine
+from database.models import Book, BookPage
+from database.pages import prefetch_pages
+from handlers.user_handlers import process_page_turn
+from keyboards.callback_data import PageCallback
+from middlewares.instrumentation import UpdateStats, current_stats
+from services.prefetch import prefetcher
+
+
+PAGES = 5
+USER_ID = 424242
+
+
+async def _create_book() -> int:
+    async with async_session() as session:
+        async with session.begin():
+            book = Book(name='test-page-turn', page_count=PAGES)
+            session.add(book)
+            await session.flush()
+            await session.execute(insert(BookPage), [
+                {'book_id': book.id, 'page_no': page_no, 'text': f'Страница {page_no}'}
+                for page_no in range(PAGES)
+            ])
+    return book.id
+
+
+async def _drop_book(book_id: int):
+    async with async_session() as session:
+        async with session.begin():
+            await session.execute(delete(BookPage).where(BookPage.book_id == book_id))
+            await session.execute(delete(Book).where(Book.id == book_id))
+
+
+async def _turn_page(bot, book_id: int, page: int) -> UpdateStats:
+    callback_query = CallbackQuery(
+        id='1', chat_instance='1', data='pg',
+        from_user=User(id=USER_ID, is_bot=False, first_name='Test'),
+        message=Message(message_id=1, date=0, chat=Chat(id=USER_ID, type='private'), text='-'),
+    ).as_(bot)
+    stats = UpdateStats()
+    token = current_stats.set(stats)
+    try:
+        await process_page_turn(callback_query, PageCallback(action='after', book_id=book_id, page=page))
+    finally:
+        current_stats.reset(token)
+        prefetcher.cancel(USER_ID)
+    return stats
+
+
+@pytest.mark.postgres
+def test_cached_page_turn_runs_no_queries(migrated_db, bot):
+    async def run():
+        book_id = await _create_book()
+        try:
+            first = await _turn_page(bot, book_id, 0)
+            await prefetch_pages(book_id, 2, 3)
+            second = await _turn_page(bot, book_id, 1)
+            return first, second
+        finally:
+            page_cache.invalidate_book(book_id)
+            await _drop_book(book_id)
+            await engine.dispose()
+
+    first, second = asyncio.run(run())
+
+    assert first.query_count > 0
+    # Число страниц и следующая страница уже в памяти
+    assert second.query_count == 0
+    assert bot.session.sent == ['Страница 1', 'Страница 2']
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+from aiogram.types import CallbackQuery, Chat, Message, User
+from sqlalchemy import delete, insert
+
+from database.database import async_session, engine
+from database.models import Book, BookPage
+from handlers.user_handlers import process_search_more_press, search_queries
+from keyboards.callback_data import SearchCallback
+from keyboards.search_kb import create_search_keyboard
+from services.search import search_pages, to_search_vector
+
+
+QUERY = 'индекс'
+# Граница порции попадает внутрь группы страниц с одинаковым рангом
+PAGE_SIZE = 3
+USER_ID = 434343
+
+
+def _pages() -> list[str]:
+    filler = 'Таблица хранит строки, запрос выбирает их по условию. '
+    pages = [filler * 5 + 'Индекс ускоряет поиск. ' * count for count in range(1, 11)]
+    # Страницы с одинаковым рангом упорядочиваются по id
+    pages += [filler + 'Индексы и индексы. '] * 3
+    pages.append(filler * 10)
+    return pages
+
+
+async def _create_book() -> int:
+    async with async_session() as session:
+        async with session.begin():
+            book = Book(name='test-search-ranking')
+            session.add(book)
+            await session.flush()
+            await session.execute(insert(BookPage), [
+                {'book_id': book.id, 'page_no': page_no, 'text': page_text}
+                for page_no, page_text in enumerate(_pages())
+            ])
+            await session.execute(
+                BookPage.__table__.update()
+                .where(BookPage.book_id == book.id)
+                .values(search_vector=to_search_vector(BookPage.text))
+            )
+    return book.id
+
+
+async def _drop_book(book_id: int):
+    async with async_session() as session:
+        async with session.begin():
+            await session.execute(delete(BookPage).where(BookPage.book_id == book_id))
+            await session.execute(delete(Book).where(Book.id == book_id))
+
+
+def _next_cursor(hits) -> tuple[float, int]:
+    # Курсор проходит тот же путь, что и в боте: кнопка "еще" и разбор ее callback_data
+    markup = create_search_keyboard(hits, (hits[-1].rank, hits[-1].id))
+    callback_data = SearchCallback.unpack(markup.inline_keyboard[-1][0].callback_data)
+    return callback_data.rank, callback_data.page_id
+
+
+async def _search_all_ways(book_id: int):
+    all_hits, has_more = await search_pages(QUERY, book_id, limit=100)
+    assert not has_more
+
+    paged_hits = []
+    after = None
+    while True:
+        hits, has_more = await search_pages(QUERY, book_id, after=after, limit=PAGE_SIZE)
+        paged_hits.extend(hits)
+        if not has_more:
+            break
+        after = _next_cursor(hits)
+        assert after == (hits[-1].rank, hits[-1].id)
+    return all_hits, paged_hits
+
+
+@pytest.mark.postgres
+def test_search_ranking_and_keyset_paging(migrated_db):
+    async def run():
+        book_id = await _create_book()
+        try:
+            return await _search_all_ways(book_id)
+        finally:
+            await _drop_book(book_id)
+            await engine.dispose()
+
+    all_hits, paged_hits = asyncio.run(run())
+
+    # Страница без слова запроса не находится, остальные - по убыванию ранга,
+    # а при равном ранге - по убыванию id
+    assert [hit.page_no for hit in all_hits] == [9, 8, 7, 6, 5, 4, 3, 2, 12, 11, 10, 1, 0]
+    keys = [(hit.rank, hit.id) for hit in all_hits]
+    assert keys == sorted(keys, reverse=True)
+    # Порции по курсору без пропусков и повторов, в том числе на одинаковых рангах
+    assert [hit.id for hit in paged_hits] == [hit.id for hit in all_hits]
+
+
+async def _press_more(bot, after: tuple[float, int]):
+    callback_query = CallbackQuery(
+        id='1', chat_instance='1', data='srch',
+        from_user=User(id=USER_ID, is_bot=False, first_name='Test'),
+        message=Message(message_id=1, date=0, chat=Chat(id=USER_ID, type='private'), text='-').as_(bot),
+    ).as_(bot)
+    rank, page_id = after
+    await process_search_more_press(callback_query, SearchCallback(rank=rank, page_id=page_id))
+
+
+@pytest.mark.postgres
+def test_search_more_press_answers_callback(migrated_db, bot):
+    async def run():
+        book_id = await _create_book()
+        search_queries[USER_ID] = (QUERY, book_id)
+        try:
+            hits, _ = await search_pages(QUERY, book_id, limit=PAGE_SIZE)
+            await _press_more(bot, _next_cursor(hits))
+            # После последней страницы результатов больше нет
+            await _press_more(bot, (0.0, 0))
+        finally:
+            del search_queries[USER_ID]
+            await _drop_book(book_id)
+            await engine.dispose()
+
+    asyncio.run(run())
+
+    # Следующая порция показана, нажатие на кнопку всегда получает ответ
+    assert len(bot.session.sent) == 1
+    assert bot.session.answered == [None, 'Ничего не найдено']
@@ -0,0 +1,56 @@
+import pytest
+
+from services.toc import TextTocBuilder
+
+
+BOOK = '''Пролог
+
+Книга лежала на столе, и никто ее не трогал.
+Part of the problem was the weather.
+
+Section 3 of the act says that
+
+ЧАСТЬ ВТОРАЯ
+
+Глава первая. Начало
+
+Текст главы.
+
+Part ill
+
+Chapter IV. The End
+
+Chapter 1 The Boy Who Lived
+
+Chapter XII
+Prose continues right after the line.
+
+Эпилог
+'''
+
+
+def _headings(text: str, chunk_size: int) -> list[tuple[str, int]]:
+    toc = TextTocBuilder()
+    for start in range(0, len(text), chunk_size):
+        toc.on_chunk(text[start:start + chunk_size], start)
+    return [(entry['title'], entry['level']) for entry in toc.entries([0])]
+
+
+@pytest.mark.parametrize('chunk_size', [len(BOOK), 1, 7, 64])
+def test_txt_headings_do_not_depend_on_chunks(chunk_size):
+    assert _headings(BOOK, chunk_size) == [
+        ('Пролог', 2),
+        ('ЧАСТЬ ВТОРАЯ', 1),
+        ('Глава первая. Начало', 2),
+        ('Chapter IV. The End', 2),
+        ('Chapter 1 The Boy Who Lived', 2),
+        ('Эпилог', 2),
+    ]
+
+
+def test_txt_heading_offsets_point_to_titles():
+    toc = TextTocBuilder()
+    toc.on_chunk(BOOK, 0)
+    toc.entries([0])
+    for offset, _, title in toc._headings:
+        assert BOOK[offset:offset + len(title)] == title
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+
+from services.extractors import iter_txt_text
+from services.paginator import MAX_PAGE_SIZE
+
+
+BOOK_SIZE = 200 * 1024 * 1024
+# Насколько может вырасти пиковая память процесса во время загрузки книги
+MEMORY_CEILING = 64 * 1024 * 1024
+
+PARAGRAPH = (
+    'Реляционная модель данных описывает таблицы, строки и связи между ними. '
+    'Запрос выбирает строки, а индекс ускоряет поиск по ключу.\r\n'
+) * 6 + '\r\n'
+
+# Тот же конвейер, что в BookWriter._page_batches, без BookWriter и записи в БД
+INGEST_SCRIPT = '''
+import asyncio
+import resource
+import sys
+
+from services.extractors import iter_txt_text
+from services.paginator import PageSplitter
+from services.toc import TextTocBuilder
+
+
+async def main(path):
+    splitter = PageSplitter()
+    toc = TextTocBuilder()
+    pages = 0
+    offset = 0
+    async for chunk in iter_txt_text(path):
+        toc.on_chunk(chunk, offset)
+        offset += len(chunk)
+        pages += sum(1 for _ in splitter.feed(chunk))
+    pages += sum(1 for _ in splitter.close())
+    return pages, len(toc.entries(splitter.page_starts))
+
+
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+pages, headings = asyncio.run(main(sys.argv[1]))
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(pages, headings, (peak - baseline) * 1024)
+'''
+
+
+def _collect(path: str, chunk_size: int) -> str:
+    async def read():
+        return ''.join([chunk async for chunk in iter_txt_text(path, chunk_size)])
+    return asyncio.run(read())
+
+
+def test_txt_chunks_keep_multibyte_characters_and_crlf(tmp_path):
+    text = 'Глава 1\r\n\r\nЁлка, «кавычки» — и тире.\r\n' * 2000
+    path = tmp_path / 'book.txt'
+    path.write_bytes(text.encode('utf-8'))
+
+    # Нечетный размер части режет и двухбайтовые символы, и пары \r\n
+    assert _collect(str(path), 4099) == text.replace('\r\n', '\n')
+
+
+def test_txt_encoding_is_detected(tmp_path):
+    text = 'Книга в кодировке Windows-1251. Съешь же ещё этих мягких французских булок.\n' * 200
+    path = tmp_path / 'book.txt'
+    path.write_bytes(text.encode('cp1251'))
+
+    assert _collect(str(path), 1000) == text
+
+
+@pytest.mark.slow
+@pytest.mark.skipif(sys.platform == 'win32', reason='resource is not available on Windows')
+def test_large_txt_ingest_memory_is_bounded(tmp_path):
+    path = tmp_path / 'large.txt'
+    chapter = ''.join(PARAGRAPH for _ in range(50)).encode('cp1251')
+    chapters = 0
+    with open(path, 'wb') as file:
+        while file.tell() < BOOK_SIZE:
+            chapters += 1
+            file.write(f'Глава {chapters}\r\n\r\n'.encode('cp1251'))
+            file.write(chapter)
+
+    result = subprocess.run(
+        [sys.executable, '-c', INGEST_SCRIPT, str(path)],
+        cwd=os.path.dirname(os.path.dirname(__file__)),
+        capture_output=True, text=True, check=True,
+    )
+    # Библиотеки могут печатать предупреждения в stdout, результат - последняя строка
+    pages, headings, memory_growth = map(int, result.stdout.splitlines()[-1].split())
+
+    # Страницы режутся по концу предложения, поэтому они короче MAX_PAGE_SIZE
+    assert pages > BOOK_SIZE // MAX_PAGE_SIZE // 2
+    assert headings == min(chapters, 5000)
+    assert memory_growth < MEMORY_CEILING, f'peak memory grew by {memory_growth / 2 ** 20:.0f} MiB'
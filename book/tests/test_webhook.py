@@ -0,0 +1,67 @@
+import asyncio
+
+from aiogram import Bot, Dispatcher
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from services.webhook import LimitedRequestHandler
+
+
+SECRET = 'test-secret'
+CONCURRENCY = 5
+UPDATES = 300
+
+
+def _update(update_id: int) -> dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': update_id, 'type': 'private'},
+            'from': {'id': update_id, 'is_bot': False, 'first_name': 'Test'},
+            'text': 'hello',
+        },
+    }
+
+
+async def _run_webhook():
+    dp = Dispatcher()
+    running = 0
+    max_running = 0
+    handled = []
+
+    @dp.message()
+    async def handler(message):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        handled.append(message.message_id)
+
+    app = web.Application()
+    LimitedRequestHandler(
+        dispatcher=dp, bot=Bot('1:test'), concurrency=CONCURRENCY, secret_token=SECRET
+    ).register(app, path='/webhook')
+
+    async with TestClient(TestServer(app)) as client:
+        unauthorized = await client.post('/webhook', json=_update(0))
+        responses = await asyncio.gather(*(
+            client.post('/webhook', json=_update(update_id), headers={'X-Telegram-Bot-Api-Secret-Token': SECRET})
+            for update_id in range(1, UPDATES + 1)
+        ))
+        while len(handled) < UPDATES:
+            await asyncio.sleep(0.01)
+    return unauthorized.status, [response.status for response in responses], max_running, handled
+
+
+def test_webhook_checks_secret_and_limits_concurrency():
+    unauthorized_status, statuses, max_running, handled = asyncio.run(
+        asyncio.wait_for(_run_webhook(), timeout=30)
+    )
+
+    assert unauthorized_status == 401
+    assert statuses == [200] * UPDATES
+    assert sorted(handled) == list(range(1, UPDATES + 1))
+    assert max_running == CONCURRENCY